@@ -0,0 +1,44 @@
+from functools import cached_property
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import get_claims_version
+
+
+class ClaimsUser(TokenUser):
+    """User built from access token claims, has ids only and no DB row"""
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def company_id(self):
+        return self.token.get('company_id')
+
+    @cached_property
+    def is_company_owner(self):
+        return self.token.get('is_company_owner', False)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Stateless JWT authentication: the user is built from token claims
+    (company_id, is_company_owner) issued at login, without loading the User row.
+    Tokens issued before a membership change are rejected, clients refresh them
+    to get current claims. Tokens without claims fall back to the DB lookup
+    """
+
+    def get_user(self, validated_token):
+        if 'company_id' not in validated_token:
+            return super().get_user(validated_token)
+
+        user = ClaimsUser(validated_token)
+
+        if validated_token.get('claims_version') != get_claims_version(user.pk):
+            raise AuthenticationFailed('Token claims are outdated, refresh the token', code='claims_outdated')
+
+        return user
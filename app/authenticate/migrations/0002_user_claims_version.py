@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='claims_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
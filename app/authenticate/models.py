@@ -35,6 +35,9 @@ class User(AbstractUser):
 
     is_company_owner = models.BooleanField(default=False)
 
+    # Changed on every membership change, tokens with older claims are rejected
+    claims_version = models.PositiveIntegerField(default=0)
+
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
@@ -1,5 +1,9 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
 from .models import User
+from .tokens import add_membership_claims
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -18,4 +22,29 @@ class UserSerializer(serializers.ModelSerializer):
 
 class AttachUserToCompanySerializer(serializers.Serializer):
     """Assign user to a specific company as an employee"""
-    email = serializers.EmailField()
\ No newline at end of file
+    email = serializers.EmailField()
+
+
+class LoginSerializer(TokenObtainPairSerializer):
+    """Token pair with user's company and role in claims"""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_membership_claims(super().get_token(user), user)
+
+
+class RefreshSerializer(TokenRefreshSerializer):
+    """New access token with current membership claims, they may have changed since login"""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        refresh = self.token_class(attrs['refresh'])
+
+        try:
+            user = User.objects.get(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]})
+        except User.DoesNotExist:
+            raise serializers.ValidationError('User not found')
+
+        data['access'] = str(add_membership_claims(refresh.access_token, user))
+        return data
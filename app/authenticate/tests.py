@@ -1,7 +1,14 @@
 from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from authenticate.authentication import ClaimsJWTAuthentication
 from authenticate.models import User
+from authenticate.tokens import revoke_claims
 from companies.models import Company
 from utils import create_owner, create_employee
 
@@ -93,3 +100,95 @@ def test_no_user_error(api_client, owner_user):
 
     assert response.status_code == 404
 
+
+# Token claims authentication
+
+@pytest.fixture
+def claims_auth(monkeypatch):
+    monkeypatch.setattr(APIView, 'authentication_classes', [ClaimsJWTAuthentication])
+
+
+def login(client, email, password='12345678'):
+    response = client.post(reverse('token_obtain_pair'), {'email': email, 'password': password}, format='json')
+    assert response.status_code == 200
+    return response.data
+
+
+@pytest.mark.django_db
+def test_claims_auth_no_user_query(api_client, owner_user, claims_auth):
+    """Read request authenticated from token claims does not load user or company"""
+
+    tokens = login(api_client, owner_user.email)
+
+    access = AccessToken(tokens['access'])
+    assert access['company_id'] == owner_user.company_id
+    assert access['is_company_owner'] is True
+
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(reverse('products-list'))
+
+    assert response.status_code == 200
+    assert not any('authenticate_user' in q['sql'] or 'companies_company' in q['sql'] for q in queries)
+
+
+@pytest.mark.django_db
+def test_claims_revoked_on_attach(api_client, owner_user, claims_auth):
+    """Error: token issued before the user was attached to a company is rejected, refreshed token works"""
+
+    new_user = User.objects.create_user(username='test_user5', email='test_user5@test.com', password='12345678')
+    tokens = login(APIClient(), new_user.email)
+
+    api_client.force_authenticate(user=owner_user)
+    api_client.post(reverse('attach-user-to-company'), {'email': new_user.email}, format='json')
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+    response = client.get(reverse('products-list'))
+    assert response.status_code == 401
+    assert response.data['code'] == 'claims_outdated'
+
+    refreshed = client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json').data
+    assert AccessToken(refreshed['access'])['company_id'] == owner_user.company_id
+
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {refreshed["access"]}')
+    assert client.get(reverse('products-list')).status_code == 200
+
+
+@pytest.mark.django_db
+def test_claims_revocation_survives_cache_loss(api_client, owner_user, claims_auth):
+    """Error: revoked token stays rejected after the cache is cleared"""
+
+    tokens = login(APIClient(), owner_user.email)
+    revoke_claims(owner_user.pk)
+    cache.clear()
+
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+    response = api_client.get(reverse('products-list'))
+    assert response.status_code == 401
+    assert response.data['code'] == 'claims_outdated'
+
+
+@pytest.mark.django_db
+def test_claims_revoked_on_company_create(api_client, test_user, claims_auth):
+    """User creates a company with claims token, then has to refresh it to act as owner"""
+
+    tokens = login(api_client, test_user.email, password='123456789101')
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+
+    response = api_client.post(reverse('company-create'), {'INN': '123456789999', 'title': 'New'}, format='json')
+    assert response.status_code == 201
+
+    test_user.refresh_from_db()
+    assert test_user.is_company_owner
+
+    assert api_client.get(reverse('products-list')).status_code == 401
+
+
+@pytest.mark.django_db
+def test_claims_auth_token_without_claims(api_client, owner_user, claims_auth):
+    """Token issued without claims falls back to loading the user"""
+
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(owner_user)}')
+    assert api_client.get(reverse('products-list')).status_code == 200
@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import User
+
+CLAIMS_VERSION_KEY = 'auth:claims-version:{}'
+CLAIMS_VERSION_TIMEOUT = 300
+
+
+def get_claims_version(user_id):
+    """
+    Current version of user's membership claims, changes on every revocation.
+    Read from the user row and cached, None if the user is gone
+    """
+
+    key = CLAIMS_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list('claims_version', flat=True).first()
+
+        if version is not None:
+            cache.set(key, version, timeout=CLAIMS_VERSION_TIMEOUT)
+
+    return version
+
+
+def revoke_claims(*user_ids):
+    """
+    Invalidate membership claims of tokens issued to the users so far.
+    The version is kept on the user row, losing the cache does not bring old tokens back
+    """
+
+    User.objects.filter(pk__in=user_ids).update(claims_version=F('claims_version') + 1)
+
+    # Readers may cache the old version until the new one is committed
+    keys = [CLAIMS_VERSION_KEY.format(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def add_membership_claims(token, user):
+    """Put user's company and role into the token, so claims authentication needs no DB lookup"""
+
+    token['company_id'] = user.company_id
+    token['is_company_owner'] = user.is_company_owner
+    token['claims_version'] = get_claims_version(user.pk)
+
+    return token
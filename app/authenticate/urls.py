@@ -1,5 +1,4 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_spectacular.utils import extend_schema_view, extend_schema
 from . import views
 
@@ -11,12 +10,12 @@ urlpatterns = [
     path('login/',
          extend_schema_view(
              post=extend_schema(tags=['api'], summary='')
-         )(TokenObtainPairView.as_view()),
+         )(views.LoginView.as_view()),
          name='token_obtain_pair'),
 
     path('token/refresh/',
          extend_schema_view(
              post=extend_schema(tags=['api'], summary='')
-         )(TokenRefreshView.as_view()),
+         )(views.RefreshView.as_view()),
          name='token_refresh'),
 ]
\ No newline at end of file
@@ -1,6 +1,8 @@
 from rest_framework.generics import CreateAPIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer, AttachUserToCompanySerializer
+from .serializers import UserSerializer, AttachUserToCompanySerializer, LoginSerializer, RefreshSerializer
+from .tokens import revoke_claims
 
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
@@ -15,6 +17,18 @@ class UserRegistrationView(CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
 
+class LoginView(TokenObtainPairView):
+    """Obtain access and refresh tokens, access token carries user's company and role"""
+
+    serializer_class = LoginSerializer
+
+
+class RefreshView(TokenRefreshView):
+    """Obtain a new access token with current company and role"""
+
+    serializer_class = RefreshSerializer
+
+
 class AttachUserToCompanyView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated, CompanyPermission]
     serializer_class = AttachUserToCompanySerializer
@@ -40,10 +54,11 @@ class AttachUserToCompanyView(generics.GenericAPIView):
         if user.is_company_owner:
             return Response({'error': 'This user owns another company'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if user.company is not None:
+        if user.company_id is not None:
             return Response({'error': 'This user already belongs to a company'}, status=status.HTTP_400_BAD_REQUEST)
 
-        user.company = owner.company
+        user.company_id = owner.company_id
         user.save()
+        revoke_claims(user.pk)
 
         return Response({'detail': 'User attached successfully'}, status=status.HTTP_200_OK)
@@ -0,0 +1,139 @@
+import pytest
+from django.urls import reverse
+
+from products.models import Product
+from sales.models import Sale
+from supplies.models import Supply
+
+# Requests are repeated on purpose, see benchmarks/conftest.py
+pytestmark = [pytest.mark.django_db, pytest.mark.allow_duplicate_queries()]
+
+ANALYTICS_RANGE = {'start_date': '2025-01-01', 'end_date': '2025-12-31'}
+
+
+@pytest.fixture
+def bench_product(bench_owner):
+    return Product.objects.filter(storage__company_id=bench_owner.company_id).order_by('id').first()
+
+
+@pytest.fixture
+def bench_sale(bench_owner):
+    return Sale.objects.filter(company_id=bench_owner.company_id).order_by('id').first()
+
+
+# Products
+
+def test_products_list(bench_client, benchmark):
+    response = benchmark('products-list', lambda: bench_client.get(reverse('products-list')))
+    assert response.status_code == 200
+
+
+def test_products_list_cursor(bench_client, benchmark):
+    response = benchmark('products-list-cursor',
+                         lambda: bench_client.get(reverse('products-list'), {'pagination': 'cursor', 'page_size': 100}))
+    assert response.status_code == 200
+
+
+def test_product_detail(bench_client, bench_product, benchmark):
+    response = benchmark('product-detail', lambda: bench_client.get(reverse('product-detail', args=[bench_product.id])))
+    assert response.status_code == 200
+
+
+def test_products_export(bench_client, benchmark):
+    response = benchmark('products-export', lambda: bench_client.get(reverse('products-export')))
+    assert response.status_code == 200
+
+
+def test_products_import(bench_client, bench_owner, benchmark):
+    rows = [{'title': f'Imported {i}', 'purchase_price': 1, 'sale_price': 2} for i in range(500)]
+    response = benchmark('products-import', lambda: bench_client.post(reverse('products-import'), rows, format='json'))
+    assert response.status_code == 201
+
+
+# Sales
+
+def test_sales_list(bench_client, benchmark):
+    response = benchmark('sales-list', lambda: bench_client.get(reverse('sales-list'), ANALYTICS_RANGE))
+    assert response.status_code == 200
+
+
+def test_sale_detail(bench_client, bench_sale, benchmark):
+    response = benchmark('sale-detail', lambda: bench_client.get(reverse('sale-detail', args=[bench_sale.id])))
+    assert response.status_code == 200
+
+
+def test_sales_export(bench_client, benchmark):
+    response = benchmark('sales-export', lambda: bench_client.get(reverse('sales-export'), {'output': 'csv'}))
+    assert response.status_code == 200
+
+
+def test_sale_create(bench_client, bench_owner, benchmark):
+    products = Product.objects.filter(storage__company_id=bench_owner.company_id).order_by('id')[:20]
+    data = {
+        'buyer_name': 'Benchmark',
+        'sale_date': '2025-06-01',
+        'product_sales': [{'product': p.id, 'quantity': 1} for p in products]
+    }
+    response = benchmark('sale-create', lambda: bench_client.post(reverse('sale-create'), data, format='json'))
+    assert response.status_code == 201
+
+
+def test_sales_batch(bench_client, bench_owner, benchmark):
+    products = list(Product.objects.filter(storage__company_id=bench_owner.company_id).order_by('id')[:10])
+    counter = iter(range(10 ** 6))
+
+    def post():
+        key = next(counter)
+        data = [
+            {
+                'client_key': f'bench-{key}-{i}',
+                'buyer_name': 'Benchmark',
+                'sale_date': '2025-06-01',
+                'product_sales': [{'product': p.id, 'quantity': 1} for p in products]
+            }
+            for i in range(100)
+        ]
+        return bench_client.post(reverse('sales-batch'), data, format='json')
+
+    response = benchmark('sales-batch', post)
+    assert response.status_code == 200
+
+
+# Analytics
+
+def test_profit_analytics(bench_client, benchmark):
+    response = benchmark('profit-analytics', lambda: bench_client.get(reverse('profit-analytics'), ANALYTICS_RANGE))
+    assert response.status_code == 200
+
+
+def test_top_products(bench_client, benchmark):
+    response = benchmark('top-products', lambda: bench_client.get(reverse('top5-sales')))
+    assert response.status_code == 200
+
+
+def test_top_products_range(bench_client, benchmark):
+    response = benchmark('top-products-range', lambda: bench_client.get(reverse('top5-sales'), ANALYTICS_RANGE))
+    assert response.status_code == 200
+
+
+def test_top_profit(bench_client, benchmark):
+    response = benchmark('top-profit', lambda: bench_client.get(reverse('top5-profit')))
+    assert response.status_code == 200
+
+
+# Supplies and suppliers
+
+def test_supplies_list(bench_client, benchmark):
+    response = benchmark('supplies-list', lambda: bench_client.get(reverse('supply-list')))
+    assert response.status_code == 200
+
+
+def test_supply_detail(bench_client, bench_owner, benchmark):
+    supply = Supply.objects.filter(supplier__company_id=bench_owner.company_id).first()
+    response = benchmark('supply-detail', lambda: bench_client.get(reverse('supply-detail', args=[supply.id])))
+    assert response.status_code == 200
+
+
+def test_suppliers_list(bench_client, benchmark):
+    response = benchmark('suppliers-list', lambda: bench_client.get(reverse('suppliers-list')))
+    assert response.status_code == 200
@@ -0,0 +1,175 @@
+"""
+API benchmark suite, not part of the regular test run:
+
+    python -m pytest benchmarks/bench_api.py
+
+Tenant size is set with BENCH_PRODUCTS, BENCH_SALES and BENCH_LINES_PER_SALE.
+Each endpoint records query count, best wall time of BENCH_RUNS runs and peak
+Python memory. Results are written to benchmarks/results.json and compared with
+benchmarks/baseline.json for the same tenant size: more queries or more memory
+(over BENCH_MEMORY_TOLERANCE) fail the benchmark, slower time fails only when
+BENCH_TIME_TOLERANCE is set. BENCH_UPDATE_BASELINE=1 stores results as the new baseline.
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core.seed import seed_tenant
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = BENCH_DIR / 'baseline.json'
+RESULTS_PATH = BENCH_DIR / 'results.json'
+
+SCALE = {
+    'products': int(os.environ.get('BENCH_PRODUCTS', 1000)),
+    'sales': int(os.environ.get('BENCH_SALES', 5000)),
+    'lines_per_sale': int(os.environ.get('BENCH_LINES_PER_SALE', 10)),
+}
+SCALE_KEY = ','.join(f'{key}={value}' for key, value in SCALE.items())
+
+RUNS = int(os.environ.get('BENCH_RUNS', 3))
+MEMORY_TOLERANCE = float(os.environ.get('BENCH_MEMORY_TOLERANCE', 0.5))
+TIME_TOLERANCE = os.environ.get('BENCH_TIME_TOLERANCE')
+
+RESULTS = {}
+
+
+def load_baseline():
+    if not BASELINE_PATH.exists():
+        return {}
+
+    return json.loads(BASELINE_PATH.read_text()).get(SCALE_KEY, {})
+
+
+def _consume(response):
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+
+
+def _measure(call):
+    """Queries and best time over RUNS runs, then one traced run for peak memory"""
+
+    times = []
+
+    for _ in range(RUNS):
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = call()
+            _consume(response)
+            times.append(time.perf_counter() - started)
+
+        # Next request resets the connection's query log
+        query_count = len(queries)
+
+    cache.clear()
+    tracemalloc.start()
+    _consume(call())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return response, {
+        'status': response.status_code,
+        'queries': query_count,
+        'time_ms': round(min(times) * 1000, 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def check_regression(name, result, baseline):
+    expected = baseline.get(name)
+
+    if expected is None:
+        return
+
+    assert result['queries'] <= expected['queries'], (
+        f'{name}: {result["queries"]} queries, baseline {expected["queries"]}'
+    )
+
+    # Small absolute slack, tiny responses vary by allocator noise
+    memory_limit = expected['peak_kb'] * (1 + MEMORY_TOLERANCE) + 64
+    assert result['peak_kb'] <= memory_limit, (
+        f'{name}: peak {result["peak_kb"]} KB, baseline {expected["peak_kb"]} KB'
+    )
+
+    if TIME_TOLERANCE is not None:
+        time_limit = expected['time_ms'] * (1 + float(TIME_TOLERANCE))
+        assert result['time_ms'] <= time_limit, (
+            f'{name}: {result["time_ms"]} ms, baseline {expected["time_ms"]} ms'
+        )
+
+
+@pytest.fixture(scope='session')
+def bench_owner(django_db_setup, django_db_blocker):
+    """Owner of the seeded benchmark tenant, seeded once per session"""
+
+    with django_db_blocker.unblock():
+        return seed_tenant(
+            products=SCALE['products'],
+            sales=SCALE['sales'],
+            lines_per_sale=SCALE['lines_per_sale']
+        )
+
+
+@pytest.fixture
+def bench_client(bench_owner):
+    client = APIClient()
+    client.force_authenticate(user=bench_owner)
+    return client
+
+
+@pytest.fixture
+def benchmark():
+    """benchmark(name, call): run the request, record its numbers and fail on regression"""
+
+    baseline = load_baseline()
+
+    def run(name, call):
+        response, result = _measure(call)
+        RESULTS[name] = result
+        check_regression(name, result, baseline)
+        return response
+
+    return run
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not RESULTS:
+        return
+
+    RESULTS_PATH.write_text(json.dumps({SCALE_KEY: RESULTS}, indent=2, sort_keys=True) + '\n')
+
+    if os.environ.get('BENCH_UPDATE_BASELINE') == '1':
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        baseline[SCALE_KEY] = RESULTS
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not RESULTS:
+        return
+
+    baseline = load_baseline()
+    terminalreporter.section(f'API benchmarks ({SCALE_KEY})')
+    terminalreporter.write_line(f'{"endpoint":<24}{"queries":>10}{"time ms":>12}{"peak KB":>12}   baseline')
+
+    for name, result in sorted(RESULTS.items()):
+        expected = baseline.get(name)
+        diff = (f'{expected["queries"]} q, {expected["time_ms"]} ms, {expected["peak_kb"]} KB'
+                if expected else '-')
+        terminalreporter.write_line(
+            f'{name:<24}{result["queries"]:>10}{result["time_ms"]:>12}{result["peak_kb"]:>12}   {diff}'
+        )
@@ -0,0 +1,170 @@
+"""
+Write throughput under concurrent sale creation, not part of the test run:
+
+    python benchmarks/write_throughput.py --workers 8 --sales 50
+
+Workers are forked processes, like server workers, so they write concurrently.
+
+Without DB_ENGINE the script compares the old SQLite setup (rollback journal,
+connection per request) with the tuned one (WAL, synchronous=NORMAL, IMMEDIATE
+transactions, persistent connections), each on a fresh temporary database file.
+With DB_ENGINE=postgres it measures the configured server in a test database
+(test_<DB_NAME>), run it with and without DB_POOL=1 to compare pooling.
+"""
+
+import argparse
+import json
+import os
+import multiprocessing
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+SQLITE_MODES = {
+    'sqlite default': {'DB_SQLITE_TUNING': '0', 'DB_SQLITE_BUSY_TIMEOUT': '5', 'DB_CONN_MAX_AGE': '0'},
+    'sqlite tuned': {'DB_SQLITE_TUNING': '1'},
+}
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+def measure(workers, sales_per_worker):
+    """Create sales from concurrent worker processes in a test database, returns throughput numbers"""
+
+    sys.path.insert(0, str(APP_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+    import django
+    django.setup()
+
+    from django.db import Error, close_old_connections, connection, connections
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from core.seed import seed_tenant
+    from products.models import Product
+    from sales.models import Sale
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    try:
+        owner = seed_tenant(name='writes', products=200, sales=0, supplies=10)
+        product_ids = list(Product.objects.filter(storage__company_id=owner.company_id).values_list('id', flat=True))
+        connections.close_all()
+
+        start = multiprocessing.Barrier(workers)
+        results = multiprocessing.Queue()
+
+        def worker(number):
+            rng = random.Random(number)
+            client = APIClient()
+            client.force_authenticate(user=owner)
+            latencies = []
+            errors = 0
+            start.wait()
+
+            for i in range(sales_per_worker):
+                data = {
+                    'buyer_name': f'Buyer {number}-{i}',
+                    'sale_date': '2025-06-01',
+                    'product_sales': [{'product': pk, 'quantity': 1} for pk in rng.sample(product_ids, 3)]
+                }
+                started = time.perf_counter()
+
+                try:
+                    if client.post(reverse('sale-create'), data, format='json').status_code != 201:
+                        errors += 1
+                except Error:
+                    errors += 1
+
+                latencies.append(time.perf_counter() - started)
+                # What request_finished does in a server: drop connections older than CONN_MAX_AGE
+                close_old_connections()
+
+            connections.close_all()
+            results.put((latencies, errors))
+
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=worker, args=(n,)) for n in range(workers)]
+        started = time.perf_counter()
+
+        for process in processes:
+            process.start()
+
+        latencies, errors = [], 0
+
+        for _ in processes:
+            worker_latencies, worker_errors = results.get()
+            latencies += worker_latencies
+            errors += worker_errors
+
+        for process in processes:
+            process.join()
+
+        elapsed = time.perf_counter() - started
+        created = Sale.objects.filter(company_id=owner.company_id).count()
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    return {
+        'created': created,
+        'errors': errors,
+        'sales_per_s': round(created / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 0.5) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+    }
+
+
+def run_mode(env, args):
+    """Measure in a fresh process, settings read DB_* variables at import"""
+
+    output = subprocess.run(
+        [sys.executable, __file__, '--workers', str(args.workers), '--sales', str(args.sales), '--child'],
+        env={**os.environ, **env}, capture_output=True, text=True, check=True
+    ).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write throughput under concurrent sale creation')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent worker processes')
+    parser.add_argument('--sales', type=int, default=50, help='Sales created by each worker')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.workers, args.sales)))
+        return
+
+    if os.environ.get('DB_ENGINE', 'sqlite') == 'sqlite':
+        results = {}
+
+        for name, env in SQLITE_MODES.items():
+            with tempfile.TemporaryDirectory() as directory:
+                results[name] = run_mode({**env, 'DB_TEST_NAME': str(Path(directory) / 'writes.sqlite3')}, args)
+    else:
+        name = os.environ['DB_ENGINE'] + (' pooled' if os.environ.get('DB_POOL') == '1' else '')
+        results = {name: run_mode({}, args)}
+
+    print(f'{args.workers} workers x {args.sales} sales')
+    print(f'{"mode":<18}{"created":>9}{"errors":>8}{"sales/s":>10}{"p50 ms":>9}{"p95 ms":>9}')
+
+    for name, result in results.items():
+        print(f'{name:<18}{result["created"]:>9}{result["errors"]:>8}{result["sales_per_s"]:>10}'
+              f'{result["p50_ms"]:>9}{result["p95_ms"]:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Company',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('INN', models.CharField(max_length=12, unique=True)),
+                ('title', models.CharField(max_length=300)),
+                ('pub_date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Company',
+                'verbose_name_plural': 'Companies',
+            },
+        ),
+    ]
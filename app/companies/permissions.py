@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from core.tenant import get_tenant
+
 
 class CompanyPermission(permissions.BasePermission):
     """
@@ -7,4 +9,6 @@ class CompanyPermission(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return request.user.is_company_owner and request.user.company == obj
+        tenant = get_tenant(request)
+
+        return tenant.is_owner and tenant.company_id == obj.id
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import Company
+from authenticate.models import User
+from authenticate.tokens import revoke_claims
 
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,16 +13,21 @@ class CompanySerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = self.context['request'].user
 
+        # Authenticated from token claims, membership is changed on the DB row
+        if not isinstance(user, User):
+            user = User.objects.get(pk=user.pk)
+
         if user.is_company_owner:
             raise serializers.ValidationError('User already owns a company')
 
-        if user.company is not None:
+        if user.company_id is not None:
             raise serializers.ValidationError('User is already attached to a company')
 
         company = Company.objects.create(**validated_data)
         user.company = company
         user.is_company_owner = True
         user.save()
+        revoke_claims(user.pk)
 
         return company
 
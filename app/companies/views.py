@@ -1,6 +1,7 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from authenticate.models import User
+from authenticate.tokens import revoke_claims
 from .models import Company
 from .permissions import CompanyPermission
 from .serializers import CompanySerializer
@@ -29,6 +30,11 @@ class CompanyDeleteView(generics.DestroyAPIView):
     def get_queryset(self):
         return Company.objects.filter(id=self.request.user.company_id)
 
+    def perform_destroy(self, instance):
+        user_ids = list(instance.users.values_list('id', flat=True))
+        super().perform_destroy(instance)
+        revoke_claims(*user_ids)
+
 
 class CompanyEditView(generics.UpdateAPIView):
     """Edit company details"""
@@ -1,4 +1,6 @@
 from rest_framework.test import APIClient
+from django.core.cache import cache
+from django.db import connection
 import pytest
 import datetime
 
@@ -9,13 +11,95 @@ from suppliers.models import Supplier
 from supplies.models import Supply, SupplyProduct
 from products.models import Product
 from sales.models import Sale, ProductSale
+from sales.rollup import record_sale
+from core.caches import cache_config
+from core.profiling import RequestProfile
 from utils import create_employee, create_owner, calculate_price_at_sale
 
+#Duplicate query detector
+
+def pytest_addoption(parser):
+    parser.addini('duplicate_query_threshold', default='5',
+                  help='Fail a test when one normalized SQL statement runs more times than this')
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'allow_duplicate_queries(*statements, threshold=None): allow statements containing any of '
+        'the given fragments (all statements without fragments) to repeat, up to threshold if given'
+    )
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    """Count SQL statements of the test body (not fixtures) and fail on N+1 patterns"""
+
+    threshold = int(item.config.getini('duplicate_query_threshold'))
+    allowed = ()
+    marker = item.get_closest_marker('allow_duplicate_queries')
+
+    if marker is not None:
+        threshold = marker.kwargs.get('threshold', threshold)
+        allowed = marker.args
+
+        if not allowed and 'threshold' not in marker.kwargs:
+            return (yield)
+
+    profile = RequestProfile()
+
+    with profile.capture():
+        result = yield
+
+    repeated = profile.repeated(threshold, allowed)
+
+    if repeated:
+        pytest.fail('Same query ran more than {} times (N+1?):\n{}'.format(
+            threshold, '\n'.join(f'{count}x {sql[:300]}' for count, sql in repeated)
+        ), pytrace=False)
+
+    return result
+
+
 #Fixtures
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cached analytics and token claims must not leak between tests"""
+
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def shared_cache(settings, tmp_path):
+    """File cache shared between processes, like redis or memcached in production"""
+
+    settings.CACHES = {'default': cache_config({'CACHE_BACKEND': 'file', 'CACHE_LOCATION': str(tmp_path / 'cache')})}
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
 
+@pytest.fixture
+def assert_no_full_scan():
+    """Check with EXPLAIN that a queryset reads given tables through an index, not a full scan"""
+
+    if connection.vendor != 'sqlite':
+        pytest.skip('Query plan checks are written for SQLite EXPLAIN QUERY PLAN')
+
+    def check(queryset, *tables):
+        plan = queryset.explain()
+
+        for table in tables:
+            assert f'SCAN {table}' not in plan, plan
+            assert f'SEARCH {table} USING' in plan, plan
+
+        return plan
+
+    return check
+
 @pytest.fixture
 def test_user(db):
     """Clean test user not attached to any company"""
@@ -311,6 +395,8 @@ def owner_with_several_sales(owner_with_storage):
                 price_at_sale=price_at_sale
             )
 
+        record_sale(sale)
+
     return owner_with_storage
 
 
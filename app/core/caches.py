@@ -0,0 +1,52 @@
+from django.core.exceptions import ImproperlyConfigured
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+# Entries of these backends are not seen by other worker processes
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_config(environ):
+    """
+    Default cache from environment variables:
+
+    CACHE_BACKEND   locmem (default, per process), redis, memcached, db or file
+    CACHE_LOCATION  server URL, table name (createcachetable) or directory, required for shared backends
+    """
+
+    backend = environ.get('CACHE_BACKEND', 'locmem')
+
+    if backend not in CACHE_BACKENDS:
+        raise ImproperlyConfigured(f'CACHE_BACKEND must be one of {", ".join(CACHE_BACKENDS)}, not {backend!r}')
+
+    config = {'BACKEND': CACHE_BACKENDS[backend]}
+
+    if environ.get('CACHE_LOCATION'):
+        config['LOCATION'] = environ['CACHE_LOCATION']
+    elif backend != 'locmem':
+        raise ImproperlyConfigured(f'CACHE_LOCATION is required for the {backend} cache')
+
+    return config
+
+
+def is_shared_cache(caches):
+    return caches['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def require_shared_cache(caches, setting):
+    """A setting that keeps state in the cache across requests needs a cache shared by all workers"""
+
+    if not is_shared_cache(caches):
+        raise ImproperlyConfigured(
+            f'{setting} needs a cache shared between worker processes, {caches["default"]["BACKEND"]} is per process. '
+            f'Set CACHE_BACKEND and CACHE_LOCATION'
+        )
@@ -0,0 +1,99 @@
+import hashlib
+import time
+from datetime import date
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import DataVersion
+from .tenant import get_tenant
+
+VERSIONED_MODELS = ('products', 'sales', 'supplies')
+
+
+def create_versions(company_id):
+    """Version rows of a new company, so reads find them with one query"""
+
+    now = int(time.time())
+    DataVersion.objects.bulk_create(
+        [DataVersion(company_id=company_id, name=model, modified=now) for model in VERSIONED_MODELS],
+        ignore_conflicts=True
+    )
+
+
+def get_versions(company_id, models):
+    """
+    Versions of company's data: {model: (version, modified unix time)}.
+    Rows missing for some reason are created, data changed before that is older than the row anyway
+    """
+
+    if company_id is None:
+        return {model: (0, 0) for model in models}
+
+    rows = {row.name: row for row in DataVersion.objects.filter(company_id=company_id, name__in=models)}
+    missing = [model for model in models if model not in rows]
+
+    if missing:
+        now = int(time.time())
+        DataVersion.objects.bulk_create(
+            [DataVersion(company_id=company_id, name=model, modified=now) for model in missing],
+            ignore_conflicts=True
+        )
+        rows = {row.name: row for row in DataVersion.objects.filter(company_id=company_id, name__in=models)}
+
+    return {model: (rows[model].version, rows[model].modified) for model in models}
+
+
+def bump_versions(*models, **company):
+    """
+    Mark data of the models as changed for the company given by a lookup, e.g.
+    company_id=1 or company__storage=storage_id. One UPDATE in the caller's
+    transaction, readers see the new version together with the data.
+    Call it last, after stock and rollups: every write path then locks product
+    rows before the version row, and holds the version row only until commit
+    """
+
+    DataVersion.objects.filter(name__in=models, **company).update(
+        version=F('version') + 1,
+        # Last-Modified has whole seconds, every change must move it forward
+        modified=Greatest(Value(int(time.time())), F('modified') + 1)
+    )
+
+
+class ConditionalGetMixin:
+    """
+    Answers GET with 304 when If-None-Match / If-Modified-Since match data
+    versions of version_models for the user's company, with one query and
+    before any other DB work. ETag covers the versions, company, path with query
+    and today's date (default date ranges move with it), Last-Modified is not
+    earlier than today's midnight for the same reason
+    """
+
+    version_models = ()
+
+    def get(self, request, *args, **kwargs):
+        company_id = get_tenant(request).company_id
+        versions = get_versions(company_id, self.version_models)
+        today = date.today()
+
+        etag = hashlib.md5(repr((
+            company_id, request.get_full_path(), today.isoformat(),
+            [versions[model][0] for model in self.version_models]
+        )).encode()).hexdigest()
+        last_modified = max(
+            int(time.mktime(today.timetuple())),
+            *(modified for _, modified in versions.values())
+        )
+
+        response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = quote_etag(etag)
+            response['Last-Modified'] = http_date(last_modified)
+
+        return response
@@ -0,0 +1,75 @@
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE_PRAGMAS = {
+    # Readers do not block the writer and the writer does not block readers
+    'journal_mode': 'WAL',
+    # Safe with WAL, commits do not wait for fsync of the database file
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def _flag(environ, name, default):
+    return environ.get(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_config(environ, base_dir):
+    """
+    Default database from environment variables:
+
+    DB_ENGINE               sqlite (default) or postgres
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+    DB_CONN_MAX_AGE         seconds to keep connections open, 0 closes them after each request (default 60)
+    DB_CONN_HEALTH_CHECKS   check persistent connections before reuse (default on)
+    DB_POOL                 postgres connection pool (psycopg[pool]) instead of persistent connections
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+    DB_SQLITE_TUNING        WAL, synchronous=NORMAL, mmap, IMMEDIATE write transactions (default on)
+    DB_SQLITE_BUSY_TIMEOUT  seconds a writer waits for the lock (default 20)
+    DB_TEST_NAME            test database name, e.g. a file for SQLite
+    """
+
+    engine = environ.get('DB_ENGINE', 'sqlite')
+
+    config = {
+        'CONN_MAX_AGE': int(environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': _flag(environ, 'DB_CONN_HEALTH_CHECKS', '1'),
+        'OPTIONS': {},
+    }
+
+    if environ.get('DB_TEST_NAME'):
+        config['TEST'] = {'NAME': environ['DB_TEST_NAME']}
+
+    if engine == 'sqlite':
+        config.update(ENGINE='django.db.backends.sqlite3', NAME=environ.get('DB_NAME', base_dir / 'db.sqlite3'))
+        config['OPTIONS']['timeout'] = int(environ.get('DB_SQLITE_BUSY_TIMEOUT', 20))
+
+        if _flag(environ, 'DB_SQLITE_TUNING', '1'):
+            config['OPTIONS'].update(
+                init_command=';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                # Take the write lock at BEGIN, so a reader does not fail upgrading to a writer
+                transaction_mode='IMMEDIATE',
+            )
+
+    elif engine == 'postgres':
+        config.update(
+            ENGINE='django.db.backends.postgresql',
+            NAME=environ.get('DB_NAME', 'crm'),
+            USER=environ.get('DB_USER', ''),
+            PASSWORD=environ.get('DB_PASSWORD', ''),
+            HOST=environ.get('DB_HOST', ''),
+            PORT=environ.get('DB_PORT', ''),
+        )
+
+        if _flag(environ, 'DB_POOL', '0'):
+            # Pooled connections are returned to the pool after each request
+            config['CONN_MAX_AGE'] = 0
+            config['OPTIONS']['pool'] = {
+                'min_size': int(environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(environ.get('DB_POOL_MAX_SIZE', 10)),
+            }
+
+    else:
+        raise ImproperlyConfigured(f'DB_ENGINE must be sqlite or postgres, not {engine!r}')
+
+    return config
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from core.caches import require_shared_cache
+from core.profiling import get_profiling_report, reset_profiling_report
+
+AVERAGES = ('queries', 'duplicates', 'sql_ms', 'serializer_ms', 'total_ms')
+
+
+class Command(BaseCommand):
+    help = 'Show per-endpoint averages collected by SQLProfilingMiddleware (SQL_PROFILING = True)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=('requests', 'max_queries') + AVERAGES, default='total_ms',
+                            help='Column to sort endpoints by, descending')
+        parser.add_argument('--reset', action='store_true', help='Clear the report after showing it')
+
+    def handle(self, *args, **options):
+        # The report is written by the server processes, a per-process cache here is always empty
+        try:
+            require_shared_cache(settings.CACHES, 'profiling_report')
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+
+        report = get_profiling_report()
+
+        if not report:
+            self.stdout.write('No profiled requests')
+            return
+
+        rows = []
+
+        for endpoint, totals in report.items():
+            row = {'endpoint': endpoint, 'requests': totals['requests'], 'max_queries': totals['max_queries']}
+            row.update({name: round(totals[name] / totals['requests'], 2) for name in AVERAGES})
+            row['worst_duplicate'] = totals['worst_duplicate']
+            rows.append(row)
+
+        rows.sort(key=lambda row: row[options['sort']], reverse=True)
+
+        self.stdout.write(f'{"endpoint":<28}{"requests":>10}{"queries":>10}{"max":>6}{"dup":>8}'
+                          f'{"sql ms":>10}{"ser. ms":>10}{"total ms":>10}')
+
+        for row in rows:
+            self.stdout.write(
+                f'{row["endpoint"]:<28}{row["requests"]:>10}{row["queries"]:>10}{row["max_queries"]:>6}'
+                f'{row["duplicates"]:>8}{row["sql_ms"]:>10}{row["serializer_ms"]:>10}{row["total_ms"]:>10}'
+            )
+
+        for row in rows:
+            if row['worst_duplicate'] is not None:
+                sql, count = row['worst_duplicate']
+                self.stdout.write(f'{row["endpoint"]}: {count}x {sql[:200]}')
+
+        if options['reset']:
+            reset_profiling_report()
+            self.stdout.write('Report cleared')
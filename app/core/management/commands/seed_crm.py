@@ -0,0 +1,59 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from companies.models import Company
+from core.seed import generated_inn, seed_crm
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic companies with users, storage, suppliers, products, supplies and sales. '
+            'Product popularity follows Zipf\'s law, sale dates are seasonal, same --seed gives the same data')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=1)
+        parser.add_argument('--employees', type=int, default=3, help='Employees per company besides the owner')
+        parser.add_argument('--suppliers', type=int, default=5, help='Suppliers per company')
+        parser.add_argument('--products', type=int, default=1000, help='Products per company')
+        parser.add_argument('--supplies', type=int, default=200, help='Supplies per company')
+        parser.add_argument('--sales', type=int, default=10000, help='Sales per company')
+        parser.add_argument('--lines-per-sale', type=float, default=3, help='Average products per sale')
+        parser.add_argument('--start', type=date.fromisoformat, default=date(2025, 1, 1),
+                            help='First sale date, YYYY-MM-DD')
+        parser.add_argument('--days', type=int, default=365, help='Number of days with sales')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of product popularity')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed', help='Prefix of generated names, must be new')
+        parser.add_argument('--password', default='password', help='Password of generated users')
+
+    def handle(self, *args, **options):
+        if options['companies'] < 1 or options['products'] < 1 or options['suppliers'] < 1:
+            raise CommandError('At least one company, product and supplier is required')
+
+        if Company.objects.filter(INN=generated_inn(options['prefix'], 'company', 0)).exists():
+            raise CommandError(f'Data with prefix "{options["prefix"]}" already exists, use another --prefix')
+
+        started = time.perf_counter()
+
+        result = seed_crm(
+            companies=options['companies'],
+            employees=options['employees'],
+            suppliers=options['suppliers'],
+            products=options['products'],
+            supplies=options['supplies'],
+            sales=options['sales'],
+            lines_per_sale=options['lines_per_sale'],
+            start=options['start'],
+            days=options['days'],
+            zipf=options['zipf'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            log=self.stdout.write
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(result["companies"])} companies, {result["sale lines"]} sale lines '
+            f'and {result["supply lines"]} supply lines in {time.perf_counter() - started:.1f}s'
+        ))
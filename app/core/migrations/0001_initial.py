@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:00
+
+import time
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    """Version rows of existing companies"""
+
+    Company = apps.get_model('companies', 'Company')
+    DataVersion = apps.get_model('core', 'DataVersion')
+    now = int(time.time())
+
+    DataVersion.objects.bulk_create([
+        DataVersion(company_id=company_id, name=name, modified=now)
+        for company_id in Company.objects.values_list('id', flat=True)
+        for name in ('products', 'sales', 'supplies')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('companies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('modified', models.BigIntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='data_versions', to='companies.company')),
+            ],
+            options={
+                'verbose_name': 'Data version',
+                'verbose_name_plural': 'Data versions',
+                'constraints': [models.UniqueConstraint(fields=('company', 'name'), name='unique_company_data_version')],
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import models
+
+
+class DataVersion(models.Model):
+    """
+    Version of one kind of a company's data (products, sales, supplies), the
+    source of ETag and Last-Modified of its lists. Bumped in the transaction
+    that changes the data, so every worker sees the new version with the data
+    """
+
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='data_versions'
+    )
+
+    name = models.CharField(max_length=32)
+    version = models.PositiveBigIntegerField(default=0)
+    # Unix time in whole seconds, like Last-Modified
+    modified = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Data version'
+        verbose_name_plural = 'Data versions'
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'name'], name='unique_company_data_version')
+        ]
+
+    def __str__(self):
+        return f'{self.company_id} {self.name}: {self.version}'
@@ -0,0 +1,176 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def get_max_page_size(view):
+    """Page size cap: view's max_page_size or MAX_PAGE_SIZE setting"""
+
+    return getattr(view, 'max_page_size', None) or getattr(settings, 'MAX_PAGE_SIZE', 100)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over view's keyset_ordering, e.g. ('sale_date', 'id').
+    Last field must be unique. Pages are selected with WHERE (key) > (cursor),
+    so there is no COUNT and no OFFSET scan, and rows inserted meanwhile
+    do not shift pages
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request, view):
+        page_size = api_settings.PAGE_SIZE
+
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except ValueError:
+            pass
+
+        return max(1, min(page_size, get_max_page_size(view)))
+
+    def encode_cursor(self, values, reverse):
+        data = json.dumps({'k': values, 'r': reverse}, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        """Key values and direction from ?cursor=, values are converted to the ordering fields' types"""
+
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None, False
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = data['k'], bool(data['r'])
+
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+
+            values = [model._meta.get_field(field).to_python(value) for field, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return values, reverse
+
+    def after(self, values, reverse):
+        """Rows that come after the key in the (possibly reversed) ordering"""
+
+        lookup = 'lt' if reverse else 'gt'
+        condition = Q()
+
+        for i, field in enumerate(self.ordering):
+            equal = {f: value for f, value in zip(self.ordering[:i], values[:i])}
+            condition |= Q(**equal, **{f'{field}__{lookup}': values[i]})
+
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(view.keyset_ordering)
+        self.page_size = self.get_page_size(request, view)
+
+        values, reverse = self.decode_cursor(request, queryset.model)
+
+        if values is not None:
+            queryset = queryset.filter(self.after(values, reverse))
+
+        order = [f'-{field}' if reverse else field for field in self.ordering]
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+
+        self.first_key = self.key(rows[0]) if rows else values
+        self.last_key = self.key(rows[-1]) if rows else values
+
+        return rows
+
+    def key(self, obj):
+        return [getattr(obj, field) for field in self.ordering]
+
+    def get_link(self, values, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values, reverse))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.get_link(self.last_key, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.get_link(self.first_key, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class OptionalKeysetPagination(PageNumberPagination):
+    """
+    Page number pagination by default. Views with keyset_ordering switch to
+    keyset pagination with ?pagination=cursor (or when a ?cursor= is given)
+    """
+
+    page_size_query_param = 'page_size'
+    mode_query_param = 'pagination'
+
+    def get_page_size(self, request):
+        page_size = super().get_page_size(request)
+        return min(page_size, get_max_page_size(self.view)) if page_size else page_size
+
+    def use_keyset(self, request, view):
+        if getattr(view, 'keyset_ordering', None) is None:
+            return False
+
+        return (request.query_params.get(self.mode_query_param) == 'cursor'
+                or KeysetPagination.cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        self.keyset = KeysetPagination() if self.use_keyset(request, view) else None
+
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
@@ -0,0 +1,22 @@
+import codecs
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """Parses text/csv body with a header row into a list of dicts"""
+
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            reader = csv.DictReader(codecs.getreader(encoding)(stream))
+            return [dict(row) for row in reader]
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ParseError(f'CSV parse error - {exc}')
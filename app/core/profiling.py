@@ -0,0 +1,212 @@
+import re
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from .caches import require_shared_cache
+
+ENDPOINTS_KEY = 'profiling:endpoints'
+REPORT_KEY = 'profiling:endpoint:{}'
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+VALUES_LIST = re.compile(r'VALUES (\([^()]*\))(?:, \([^()]*\))+')
+SPACES = re.compile(r'\s+')
+
+_current_profile = ContextVar('sql_profile', default=None)
+
+
+def normalize_sql(sql):
+    """Same statement whatever the params, number of IN items or inserted rows"""
+
+    sql = SPACES.sub(' ', sql).strip()
+    sql = IN_LIST.sub('IN (...)', sql)
+    return VALUES_LIST.sub(r'VALUES \1, ...', sql)
+
+
+class RequestProfile:
+    """Normalized SQL statements, SQL time and serializer time of one request"""
+
+    def __init__(self):
+        self.statements = Counter()
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        """Queries repeating an earlier statement with other params, the N+1 signature"""
+
+        return self.queries - len(self.statements)
+
+    def worst_duplicate(self):
+        """(sql, count) of the most repeated statement or None"""
+
+        if not self.duplicates:
+            return None
+
+        return self.statements.most_common(1)[0]
+
+    def repeated(self, threshold, allowed=()):
+        """[(count, sql)] of statements run more than threshold times, except allowed fragments"""
+
+        return sorted(
+            ((count, sql) for sql, count in self.statements.items()
+             if count > threshold and not any(fragment in sql for fragment in allowed)),
+            reverse=True
+        )
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper
+        started = perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.statements[normalize_sql(sql)] += 1
+
+    def capture(self):
+        """Record queries on all connections and serializer time while the context is open"""
+
+        stack = ExitStack()
+
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+
+        token = _current_profile.set(self)
+        stack.callback(_current_profile.reset, token)
+
+        return stack
+
+
+def _timed_data(data):
+    def timed(serializer):
+        profile = _current_profile.get()
+
+        # Nested serializers are counted in the outer one
+        if profile is None or profile.serializing:
+            return data.fget(serializer)
+
+        profile.serializing = True
+        started = perf_counter()
+
+        try:
+            return data.fget(serializer)
+        finally:
+            profile.serializer_time += perf_counter() - started
+            profile.serializing = False
+
+    timed.profiled = True
+    return property(timed)
+
+
+def install_serializer_timer():
+    """Time serializer.data of every DRF serializer, once per process"""
+
+    if not getattr(BaseSerializer.data.fget, 'profiled', False):
+        BaseSerializer.data = _timed_data(BaseSerializer.data)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def record_profile(endpoint, profile, total_time):
+    """
+    Add a request to the endpoint's report in the cache. Read and write are
+    not atomic, concurrent requests may lose a sample, which is fine for averages
+    """
+
+    key = REPORT_KEY.format(endpoint)
+    report = cache.get(key) or {
+        'requests': 0, 'queries': 0, 'max_queries': 0, 'duplicates': 0,
+        'sql_ms': 0.0, 'serializer_ms': 0.0, 'total_ms': 0.0, 'worst_duplicate': None,
+    }
+
+    report['requests'] += 1
+    report['queries'] += profile.queries
+    report['max_queries'] = max(report['max_queries'], profile.queries)
+    report['duplicates'] += profile.duplicates
+    report['sql_ms'] += _ms(profile.sql_time)
+    report['serializer_ms'] += _ms(profile.serializer_time)
+    report['total_ms'] += _ms(total_time)
+
+    worst = profile.worst_duplicate()
+
+    if worst is not None and (report['worst_duplicate'] is None or worst[1] > report['worst_duplicate'][1]):
+        report['worst_duplicate'] = worst
+
+    cache.set(key, report, timeout=None)
+
+    endpoints = cache.get(ENDPOINTS_KEY, set())
+
+    if endpoint not in endpoints:
+        cache.set(ENDPOINTS_KEY, endpoints | {endpoint}, timeout=None)
+
+
+def get_profiling_report():
+    """Totals per URL name: {url_name: {'requests', 'queries', 'sql_ms', ...}}"""
+
+    endpoints = cache.get(ENDPOINTS_KEY, set())
+    reports = cache.get_many([REPORT_KEY.format(endpoint) for endpoint in endpoints])
+
+    return {endpoint: reports[REPORT_KEY.format(endpoint)]
+            for endpoint in sorted(endpoints) if REPORT_KEY.format(endpoint) in reports}
+
+
+def reset_profiling_report():
+    endpoints = cache.get(ENDPOINTS_KEY, set())
+    cache.delete_many([ENDPOINTS_KEY] + [REPORT_KEY.format(endpoint) for endpoint in endpoints])
+
+
+def server_timing(profile, total_time):
+    return (
+        f'sql;dur={_ms(profile.sql_time)};desc="{profile.queries} queries, {profile.duplicates} duplicate", '
+        f'serializer;dur={_ms(profile.serializer_time)}, '
+        f'total;dur={_ms(total_time)}'
+    )
+
+
+class SQLProfilingMiddleware:
+    """
+    With SQL_PROFILING = True, records query count, SQL time, duplicate queries
+    and serializer time of each request. They are sent in the Server-Timing header
+    and added to a per-URL-name report in the shared cache (see profiling_report command)
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            raise MiddlewareNotUsed
+
+        require_shared_cache(settings.CACHES, 'SQL_PROFILING')
+
+        install_serializer_timer()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        started = perf_counter()
+
+        with profile.capture():
+            response = self.get_response(request)
+
+        total_time = perf_counter() - started
+        response['Server-Timing'] = server_timing(profile, total_time)
+
+        match = request.resolver_match
+
+        if match is not None:
+            record_profile(match.view_name, profile, total_time)
+
+        return response
@@ -0,0 +1,225 @@
+import hashlib
+import math
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from authenticate.models import User
+from companies.models import Company
+from core.conditional import bump_versions
+from products.models import Product
+from sales.models import Sale, ProductSale
+from sales.rollup import rebuild_sales_analytics
+from storage.models import Storage
+from suppliers.models import Supplier
+from supplies.models import Supply, SupplyProduct
+
+BATCH_SIZE = 5000
+CENT = Decimal('0.01')
+
+QUANTITIES = (1, 2, 3, 4, 5)
+QUANTITY_WEIGHTS = (50, 25, 12, 8, 5)
+DISCOUNTS = (0, 5, 10, 15)
+DISCOUNT_WEIGHTS = (80, 10, 7, 3)
+
+
+def _insert_rows(model, fields, rows, batch_size=BATCH_SIZE):
+    """
+    Insert value tuples with executemany, skipping model instances and
+    the ORM insert compiler, returns number of rows. Rows get no ids back
+    """
+
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+    sql = (f'INSERT INTO {quote(model._meta.db_table)} ({columns}) '
+           f'VALUES ({", ".join(["%s"] * len(fields))})')
+
+    count = 0
+    rows = iter(rows)
+
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+            count += len(batch)
+
+    return count
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights of ranks 1..count with Zipf popularity 1 / rank ** exponent"""
+
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def seasonal_weights(start, days):
+    """
+    Cumulative weights of days: yearly wave peaking in late December,
+    busier weekends
+    """
+
+    weights = []
+
+    for offset in range(days):
+        day = start + timedelta(offset)
+        season = 1 + 0.35 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 355) / 365.25)
+        weekend = 1.3 if day.weekday() >= 5 else 1
+
+        weights.append(season * weekend)
+
+    return list(accumulate(weights))
+
+
+def generated_inn(prefix, kind, index):
+    """Stable 12-digit INN for a generated company or supplier"""
+
+    digest = hashlib.sha256(f'{prefix}:{kind}:{index}'.encode()).hexdigest()
+    return str(int(digest, 16) % 10 ** 12).zfill(12)
+
+
+def _seed_company(rng, prefix, index, password, employees, suppliers, products, supplies, sales,
+                  lines_per_sale, start, days, zipf, stock, log):
+    name = f'{prefix}-{index}'
+
+    company = Company.objects.create(title=f'Company {name}', INN=generated_inn(prefix, 'company', index))
+    storage = Storage.objects.create(address=f'Storage {name}', company=company)
+
+    User.objects.bulk_create([
+        User(username=f'{name}-{role}', email=f'{name}-{role}@example.com', password=password,
+             company=company, is_company_owner=role == 'owner')
+        for role in ['owner'] + [f'employee-{i}' for i in range(employees)]
+    ])
+
+    created_suppliers = Supplier.objects.bulk_create([
+        Supplier(title=f'Supplier {name}-{i}', INN=generated_inn(prefix, f'supplier-{index}', i), company=company)
+        for i in range(suppliers)
+    ])
+
+    catalog = []
+    for i in range(products):
+        purchase_price = Decimal(rng.randrange(100, 10000)) / 100
+        margin = Decimal(rng.randrange(110, 200)) / 100
+        catalog.append(Product(
+            title=f'Product {name}-{i}',
+            purchase_price=purchase_price,
+            sale_price=(purchase_price * margin).quantize(CENT),
+            storage=storage
+        ))
+
+    catalog = Product.objects.bulk_create(catalog, batch_size=BATCH_SIZE)
+    log(f'{name}: {len(catalog)} products')
+
+    # Popularity rank does not follow insertion order
+    by_popularity = rng.sample(range(len(catalog)), len(catalog))
+    popularity = zipf_weights(len(catalog), zipf)
+    day_weights = seasonal_weights(start, days)
+
+    sold = [0] * len(catalog)
+    line_count = 0
+    sale_days = sorted(rng.choices(range(days), cum_weights=day_weights, k=sales))
+
+    for chunk_start in range(0, sales, BATCH_SIZE):
+        chunk = Sale.objects.bulk_create([
+            Sale(
+                company=company,
+                buyer_name=f'Buyer {rng.randrange(sales)}',
+                sale_date=start + timedelta(offset),
+                discount=rng.choices(DISCOUNTS, weights=DISCOUNT_WEIGHTS)[0]
+            )
+            for offset in sale_days[chunk_start:chunk_start + BATCH_SIZE]
+        ])
+
+        lines = []
+        for sale in chunk:
+            size = min(len(catalog), max(1, round(rng.expovariate(1 / lines_per_sale))))
+            picked = dict.fromkeys(rng.choices(by_popularity, cum_weights=popularity, k=size))
+
+            for i in picked:
+                product = catalog[i]
+                quantity = rng.choices(QUANTITIES, weights=QUANTITY_WEIGHTS)[0]
+                sold[i] += quantity
+
+                lines.append((
+                    sale.id,
+                    product.id,
+                    quantity,
+                    (product.sale_price * (1 - Decimal(sale.discount) / 100)).quantize(CENT),
+                    product.purchase_price
+                ))
+
+        line_count += _insert_rows(
+            ProductSale, ('sale', 'product', 'quantity', 'price_at_sale', 'purchase_price_at_sale'), lines
+        )
+
+    log(f'{name}: {sales} sales, {line_count} sale lines')
+
+    # Every product is delivered by 1-3 supplies, enough to cover sales and leave some stock
+    created_supplies = Supply.objects.bulk_create([
+        Supply(supplier=rng.choice(created_suppliers), delivery_date=start + timedelta(rng.randrange(days)))
+        for _ in range(supplies)
+    ], batch_size=BATCH_SIZE)
+
+    def supply_lines():
+        for i, product in enumerate(catalog):
+            left = rng.randint(*stock)
+            delivered = sold[i] + left
+            parts = rng.sample(created_supplies, min(len(created_supplies), rng.randint(1, 3)))
+
+            for n, supply in enumerate(parts):
+                quantity = delivered // len(parts) + (delivered % len(parts) if n == 0 else 0)
+
+                if quantity:
+                    yield supply.id, product.id, quantity
+
+            product.quantity = left
+
+    supply_line_count = _insert_rows(SupplyProduct, ('supply', 'product', 'quantity'), supply_lines()) if created_supplies else 0
+    Product.objects.bulk_update(catalog, ['quantity'], batch_size=1000)
+
+    log(f'{name}: {len(created_supplies)} supplies, {supply_line_count} supply lines')
+
+    return company, line_count, supply_line_count
+
+
+def seed_crm(companies=1, employees=3, suppliers=5, products=1000, supplies=200, sales=10000,
+             lines_per_sale=3, start=date(2025, 1, 1), days=365, zipf=1.1, stock=(0, 50), seed=0,
+             prefix='seed', password='password', log=lambda message: None):
+    """
+    Generate companies with owners, employees, storage, suppliers, products, supplies
+    and sales using bulk inserts. Product popularity follows Zipf's law, sale dates
+    follow a yearly and weekly season, stock left after sales is drawn from the stock range
+    and supplies deliver exactly sold plus left.
+    Same seed gives the same data. Returns created companies and row counts
+    """
+
+    rng = random.Random(seed)
+    password = make_password(password)
+
+    result = {'companies': [], 'sale lines': 0, 'supply lines': 0}
+
+    for index in range(companies):
+        with transaction.atomic():
+            company, line_count, supply_line_count = _seed_company(
+                rng, prefix, index, password, employees, suppliers, products, supplies, sales,
+                lines_per_sale, start, days, zipf, stock, log
+            )
+            rebuild_sales_analytics([company.id])
+            bump_versions('products', 'sales', 'supplies', company_id=company.id)
+
+        result['companies'].append(company)
+        result['sale lines'] += line_count
+        result['supply lines'] += supply_line_count
+
+    return result
+
+
+def seed_tenant(name='bench', products=1000, sales=5000, lines_per_sale=10, supplies=100, seed=0):
+    """Single company for benchmarks with stock for repeated sales, returns its owner"""
+
+    company = seed_crm(products=products, sales=sales, lines_per_sale=lines_per_sale, supplies=supplies,
+                       stock=(10 ** 6, 10 ** 6), seed=seed, prefix=name)['companies'][0]
+
+    return User.objects.get(company=company, is_company_owner=True)
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from core.caches import cache_config, require_shared_cache
+from core.database import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,11 +48,13 @@ INSTALLED_APPS = [
     'supplies',
     'products',
     'sales',
+    'core',
     'rest_framework',
     'drf_spectacular',
 ]
 
 MIDDLEWARE = [
+    'core.profiling.SQLProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,18 +64,47 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Record query count, SQL time, duplicate queries and serializer time of every request:
+# Server-Timing header and per-endpoint report (manage.py profiling_report, SQL_PROFILING=1).
+# The report is kept in the cache, so it requires a cache shared between workers and the command
+SQL_PROFILING = os.environ.get('SQL_PROFILING', '0').lower() in ('1', 'true', 'yes', 'on')
+
+# Build request user from access token claims (company_id, is_company_owner) instead
+# of loading it on every request (JWT_CLAIMS_AUTH=1). Claims versions are kept on the user
+# and cached, revocations drop the cached version, so it requires a cache shared between workers (CACHE_BACKEND)
+JWT_CLAIMS_AUTH = os.environ.get('JWT_CLAIMS_AUTH', '0').lower() in ('1', 'true', 'yes', 'on')
+
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.OptionalKeysetPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authenticate.authentication.ClaimsJWTAuthentication' if JWT_CLAIMS_AUTH
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+# Largest page size clients can request with ?page_size=
+MAX_PAGE_SIZE = 100
+
+# Configured with CACHE_* environment variables, see core/caches.py
+CACHES = {
+    'default': cache_config(os.environ)
+}
+
+if JWT_CLAIMS_AUTH:
+    require_shared_cache(CACHES, 'JWT_CLAIMS_AUTH')
+
+if SQL_PROFILING:
+    require_shared_cache(CACHES, 'SQL_PROFILING')
+
+# Seconds analytics responses stay cached, sale changes drop them earlier.
+# Only with a shared cache, the per-process default would keep other workers' copies stale
+ANALYTICS_CACHE_TIMEOUT = 300
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Your Project API',
     'DESCRIPTION': 'Your project description',
@@ -99,12 +134,10 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+# Configured with DB_* environment variables, see core/database.py
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(os.environ, BASE_DIR),
 }
 
 
@@ -147,3 +180,8 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
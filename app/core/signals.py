@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .conditional import bump_versions, create_versions
+
+
+def _bump_once(origin, *models, **company):
+    """A cascade sends post_delete for every collected row, bump the same versions once per delete() call"""
+
+    if origin is None:
+        bump_versions(*models, **company)
+        return
+
+    bumped = origin.__dict__.setdefault('_bumped_versions', set())
+    key = (models, tuple(sorted(company.items())))
+
+    if key not in bumped:
+        bumped.add(key)
+        bump_versions(*models, **company)
+
+
+# Sales and supplies are saved before their stock moves, their serializers and admin
+# bump versions at the end instead. Deletes roll stock back first, post_delete is last
+
+@receiver(post_save, sender='companies.Company')
+def create_company_versions(sender, instance, created, **kwargs):
+    if created:
+        create_versions(instance.id)
+
+
+@receiver(post_save, sender='products.Product')
+def bump_saved_product(sender, instance, **kwargs):
+    bump_versions('products', company__storage=instance.storage_id)
+
+
+@receiver(post_delete, sender='products.Product')
+def bump_deleted_product(sender, instance, origin=None, **kwargs):
+    # Cascades delete products before their storage, it still exists here
+    _bump_once(origin, 'products', company__storage=instance.storage_id)
+
+
+@receiver(post_delete, sender='sales.Sale')
+def bump_deleted_sale(sender, instance, origin=None, **kwargs):
+    # Sales move stock
+    _bump_once(origin, 'sales', 'products', company_id=instance.company_id)
+
+
+@receiver(post_delete, sender='supplies.Supply')
+def bump_deleted_supply(sender, instance, origin=None, **kwargs):
+    # Cascades delete supplies before their supplier, it still exists here
+    _bump_once(origin, 'supplies', 'products', company__suppliers=instance.supplier_id)
@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """
+    Company of the request's user as plain ids, so permission checks
+    and company filters do not load the user's company
+    """
+
+    user_id: int | None = None
+    company_id: int | None = None
+    is_owner: bool = False
+
+    @property
+    def has_company(self):
+        return self.company_id is not None
+
+
+ANONYMOUS = Tenant()
+
+
+def get_tenant(request):
+    """Tenant of the request's user, resolved once per request"""
+
+    user = request.user
+    tenant = getattr(request, '_tenant', None)
+
+    if tenant is not None and tenant.user_id == user.pk:
+        return tenant
+
+    if user.is_authenticated:
+        tenant = Tenant(user_id=user.pk, company_id=user.company_id, is_owner=user.is_company_owner)
+    else:
+        tenant = ANONYMOUS
+
+    request._tenant = tenant
+    return tenant
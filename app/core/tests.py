@@ -0,0 +1,231 @@
+import os
+import subprocess
+import sys
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from django.test import override_settings
+from django.urls import reverse
+
+from companies.models import Company
+from core.caches import cache_config, require_shared_cache
+from core.database import database_config
+from core.profiling import RequestProfile, SQLProfilingMiddleware, get_profiling_report
+from products.models import Product
+from sales.models import Sale, ProductSale, ProductSalesTotal
+from sales.rollup import find_mismatches
+from supplies.models import SupplyProduct
+
+
+def seeded_data(prefix):
+    company = Company.objects.get(title=f'Company {prefix}-0')
+    sales = list(Sale.objects.filter(company=company).order_by('id').values_list('sale_date', 'discount'))
+    lines = list(ProductSale.objects.filter(sale__company=company)
+                 .order_by('sale_id', 'id').values_list('product__title', 'quantity', 'price_at_sale'))
+    return sales, [(title.split('-')[-1], quantity, price) for title, quantity, price in lines]
+
+
+#Seed CRM command
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries()
+def test_seed_crm_deterministic():
+    """Same seed generates the same sales under another prefix"""
+
+    call_command('seed_crm', products=30, sales=100, supplies=10, seed=7, prefix='first')
+    call_command('seed_crm', products=30, sales=100, supplies=10, seed=7, prefix='second')
+    call_command('seed_crm', products=30, sales=100, supplies=10, seed=8, prefix='third')
+
+    assert seeded_data('first') == seeded_data('second')
+    assert seeded_data('first') != seeded_data('third')
+
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries()
+def test_seed_crm_consistent_data():
+    """Stock equals delivered minus sold, rollups match sales, popular products sell most"""
+
+    call_command('seed_crm', companies=2, employees=2, products=100, sales=2000, supplies=20, prefix='shop')
+
+    company = Company.objects.get(title='Company shop-1')
+    assert company.users.count() == 3
+    assert Sale.objects.filter(company=company).count() == 2000
+    assert find_mismatches() == []
+
+    for product in Product.objects.filter(storage__company=company):
+        delivered = SupplyProduct.objects.filter(product=product).aggregate(total=Sum('quantity'))['total']
+        sold = ProductSale.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        assert product.quantity == delivered - sold >= 0
+
+    units = list(ProductSalesTotal.objects.filter(company=company)
+                 .order_by('-units_sold').values_list('units_sold', flat=True))
+    assert units[0] > 10 * units[len(units) // 2]
+
+
+@pytest.mark.django_db
+def test_seed_crm_existing_prefix():
+    """Error: prefix already used"""
+
+    call_command('seed_crm', products=5, sales=10, supplies=2, prefix='twice')
+
+    with pytest.raises(CommandError):
+        call_command('seed_crm', products=5, sales=10, supplies=2, prefix='twice')
+
+
+#SQL profiling middleware
+
+@pytest.mark.django_db
+def test_profiling_server_timing_and_report(api_client, owner_with_sales, tmp_path):
+    """Profiled requests get Server-Timing, the report command reads and clears them from another process"""
+
+    api_client.force_authenticate(user=owner_with_sales)
+    environ = {'CACHE_BACKEND': 'file', 'CACHE_LOCATION': str(tmp_path)}
+
+    with override_settings(SQL_PROFILING=True, CACHES={'default': cache_config(environ)}):
+        api_client.get(reverse('sales-list'))
+        response = api_client.get(reverse('sales-list'))
+
+        assert response.status_code == 200
+        assert 'sql;dur=' in response['Server-Timing']
+        assert 'serializer;dur=' in response['Server-Timing']
+
+        report = get_profiling_report()['sales-list']
+        assert report['requests'] == 2
+        assert report['queries'] >= 2
+        assert report['serializer_ms'] > 0
+
+        command = subprocess.run(
+            [sys.executable, 'manage.py', 'profiling_report', '--reset'],
+            cwd=settings.BASE_DIR, env={**os.environ, **environ}, capture_output=True, text=True
+        )
+
+        assert command.returncode == 0, command.stderr
+        assert 'sales-list' in command.stdout
+        assert 'Report cleared' in command.stdout
+        assert get_profiling_report() == {}
+
+
+def test_profiling_report_requires_shared_cache():
+    """Error: report command with a per-process cache would never see the server's requests"""
+
+    with pytest.raises(CommandError, match='shared between worker processes'):
+        call_command('profiling_report', stdout=StringIO())
+
+    with override_settings(SQL_PROFILING=True), pytest.raises(ImproperlyConfigured, match='SQL_PROFILING'):
+        SQLProfilingMiddleware(lambda request: None)
+
+
+@pytest.mark.django_db
+def test_profiling_disabled(api_client, owner_with_sales):
+    """Profiling is off by default"""
+
+    api_client.force_authenticate(user=owner_with_sales)
+    response = api_client.get(reverse('sales-list'))
+
+    assert 'Server-Timing' not in response
+    assert get_profiling_report() == {}
+
+
+@pytest.mark.django_db
+def test_profile_duplicate_queries(test_product_owner):
+    """Same statement with other params counts as duplicate"""
+
+    profile = RequestProfile()
+
+    with profile.capture():
+        for _ in range(3):
+            list(Product.objects.filter(id=test_product_owner.id))
+        list(Company.objects.all())
+
+    assert profile.queries == 4
+    assert profile.duplicates == 2
+    assert profile.worst_duplicate()[1] == 3
+
+
+@pytest.mark.django_db
+def test_profile_normalizes_in_lists(test_product_owner):
+    """IN lists of any length are one statement, allowed fragments are not reported"""
+
+    profile = RequestProfile()
+
+    with profile.capture():
+        for size in range(1, 5):
+            list(Product.objects.filter(id__in=range(size)))
+
+    assert profile.duplicates == 3
+    assert profile.repeated(3) == [(4, profile.worst_duplicate()[0])]
+    assert profile.repeated(4) == []
+    assert profile.repeated(3, allowed=['"products_product"']) == []
+
+
+#Database configuration
+
+def test_database_config_sqlite_defaults(tmp_path):
+    """SQLite keeps connections and is tuned for concurrent writes by default"""
+
+    config = database_config({}, tmp_path)
+
+    assert config['ENGINE'] == 'django.db.backends.sqlite3'
+    assert config['NAME'] == tmp_path / 'db.sqlite3'
+    assert config['CONN_MAX_AGE'] == 60
+    assert config['CONN_HEALTH_CHECKS'] is True
+    assert 'PRAGMA journal_mode=WAL' in config['OPTIONS']['init_command']
+    assert config['OPTIONS']['transaction_mode'] == 'IMMEDIATE'
+
+    config = database_config({'DB_SQLITE_TUNING': '0', 'DB_CONN_MAX_AGE': '0'}, tmp_path)
+
+    assert config['CONN_MAX_AGE'] == 0
+    assert 'init_command' not in config['OPTIONS']
+
+
+def test_database_config_postgres_pool(tmp_path):
+    """Pooled PostgreSQL does not keep persistent connections"""
+
+    environ = {'DB_ENGINE': 'postgres', 'DB_NAME': 'crm', 'DB_HOST': 'db', 'DB_POOL': '1', 'DB_POOL_MAX_SIZE': '20'}
+    config = database_config(environ, tmp_path)
+
+    assert config['ENGINE'] == 'django.db.backends.postgresql'
+    assert config['HOST'] == 'db'
+    assert config['CONN_MAX_AGE'] == 0
+    assert config['OPTIONS']['pool'] == {'min_size': 2, 'max_size': 20}
+
+    assert 'pool' not in database_config({**environ, 'DB_POOL': '0'}, tmp_path)['OPTIONS']
+
+
+def test_database_config_unknown_engine(tmp_path):
+    """Error: unsupported engine"""
+
+    with pytest.raises(ImproperlyConfigured):
+        database_config({'DB_ENGINE': 'oracle'}, tmp_path)
+
+
+#Cache configuration
+
+def test_cache_config_from_environment():
+    """Per-process cache by default, shared backends need a location"""
+
+    assert cache_config({}) == {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+    config = cache_config({'CACHE_BACKEND': 'redis', 'CACHE_LOCATION': 'redis://cache:6379/1'})
+    assert config == {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/1'}
+
+    with pytest.raises(ImproperlyConfigured):
+        cache_config({'CACHE_BACKEND': 'redis'})
+
+    with pytest.raises(ImproperlyConfigured):
+        cache_config({'CACHE_BACKEND': 'mongo', 'CACHE_LOCATION': 'x'})
+
+
+def test_claims_auth_requires_shared_cache(tmp_path):
+    """Error: claims revocation kept in a per-process cache is refused"""
+
+    with pytest.raises(ImproperlyConfigured, match='JWT_CLAIMS_AUTH'):
+        require_shared_cache({'default': cache_config({})}, 'JWT_CLAIMS_AUTH')
+
+    require_shared_cache({'default': cache_config({'CACHE_BACKEND': 'file', 'CACHE_LOCATION': str(tmp_path)})},
+                         'JWT_CLAIMS_AUTH')
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('storage', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('purchase_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('sale_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('storage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='products', to='storage.storage')),
+            ],
+            options={
+                'verbose_name': 'Product',
+                'verbose_name_plural': 'Products',
+                'indexes': [models.Index(fields=['storage', 'id'], name='product_storage_id_idx')],
+            },
+        ),
+    ]
@@ -19,6 +19,10 @@ class Product(models.Model):
     class Meta:
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
+        indexes = [
+            # Storage's products in list order (ORDER BY id) without a sort
+            models.Index(fields=['storage', 'id'], name='product_storage_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Product
+from core.tenant import get_tenant
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,8 +9,7 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'purchase_price', 'sale_price', 'storage', 'quantity']
 
     def validate_storage(self, value):
-        user = self.context['request'].user
-        if value.company != user.company:
+        if value.company_id != get_tenant(self.context['request']).company_id:
             raise serializers.ValidationError('Storage should belong to the company')
         return value
 
@@ -23,3 +23,51 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Price cannot be negative')
         return price
 
+
+class ProductImportSerializer(ProductSerializer):
+    """
+    Row of a bulk import. Storage is checked against storage ids resolved once
+    per batch and may be omitted only when the company has a single storage
+    """
+
+    storage = serializers.IntegerField(required=False)
+    import_columns = ('title', 'purchase_price', 'sale_price', 'storage')
+
+    def validate_storage(self, value):
+        if value not in self.context['storage_ids']:
+            raise serializers.ValidationError('Storage should belong to the company')
+        return value
+
+    def validate(self, attrs):
+        if 'storage' not in attrs:
+            if len(self.context['storage_ids']) > 1:
+                raise serializers.ValidationError({'storage': 'Company has several storages, storage is required'})
+
+            attrs['storage'] = next(iter(self.context['storage_ids']))
+
+        return attrs
+
+
+class CompanyProductListSerializer(serializers.ListSerializer):
+    """
+    List of lines with a product id (sale or supply lines).
+    All products are loaded in one query scoped to the user's company,
+    unknown or foreign ids are reported together
+    """
+
+    def validate(self, attrs):
+        company_id = get_tenant(self.context['request']).company_id
+        ids = {line['product'] for line in attrs}
+
+        products = Product.objects.filter(id__in=ids, storage__company_id=company_id).in_bulk()
+        missing = sorted(ids - products.keys())
+
+        if missing:
+            raise serializers.ValidationError({
+                'product': f'Products do not exist or belong to another company: {missing}'
+            })
+
+        for line in attrs:
+            line['product'] = products[line['product']]
+
+        return attrs
@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Product
+
+
+def collect_quantities(items):
+    """Sum quantities of sale/supply lines per product: {product_id: quantity}"""
+
+    return dict(
+        items
+        .order_by()
+        .values_list('product_id')
+        .annotate(total=Sum('quantity'))
+    )
+
+
+def _quantity_change(deltas):
+    return Case(
+        *[When(id=pk, then=Value(delta)) for pk, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def move_stock(deltas):
+    """
+    Change stock of several products with a single UPDATE.
+    deltas: {product_id: signed quantity change}
+    """
+
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+
+    if not deltas:
+        return 0
+
+    return Product.objects.filter(id__in=deltas).update(
+        quantity=F('quantity') + _quantity_change(deltas),
+        updated_at=timezone.now()
+    )
+
+
+def reserve_stock(quantities):
+    """
+    Take quantities out of stock only if every product has enough of it.
+    The check and the decrement are one conditional UPDATE, so concurrent
+    reservations cannot oversell. Returns products that are short,
+    in that case stock is left untouched. Raises ValidationError when a product
+    was deleted meanwhile.
+    quantities: {product_id: quantity}
+    """
+
+    if not quantities:
+        return []
+
+    enough_stock = Q()
+    for pk, qty in quantities.items():
+        enough_stock |= Q(id=pk, quantity__gte=qty)
+
+    while True:
+        with transaction.atomic():
+            updated = Product.objects.filter(enough_stock).update(
+                quantity=F('quantity') - _quantity_change(quantities),
+                updated_at=timezone.now()
+            )
+
+            if updated == len(quantities):
+                return []
+
+            transaction.set_rollback(True)
+
+        products = list(Product.objects.filter(id__in=quantities).only('id', 'title', 'quantity'))
+
+        if len(products) < len(quantities):
+            missing = sorted(set(quantities) - {product.id for product in products})
+            raise ValidationError({'product': f'Products do not exist: {missing}'})
+
+        short = [product for product in products if product.quantity < quantities[product.id]]
+
+        # Stock may have been replenished since the update, try again
+        if short:
+            return short
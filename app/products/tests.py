@@ -1,7 +1,16 @@
 import pytest
+import csv
+import json
+import time
+from datetime import date
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 
 from authenticate.models import User
+from core.models import DataVersion
 from storage.models import Storage
 from .models import Product
 
@@ -146,6 +155,31 @@ def test_list_products_employee_success(api_client, employee_with_product):
     assert response.status_code == 200
 
 
+@pytest.mark.django_db
+def test_list_products_page_size_cap(api_client, owner_with_storage, settings):
+    """Page size can be requested up to MAX_PAGE_SIZE in both pagination modes"""
+
+    settings.MAX_PAGE_SIZE = 15
+    api_client.force_authenticate(user=owner_with_storage)
+    Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=15, storage=owner_with_storage.company.storage)
+        for i in range(20)
+    ])
+
+    url = reverse('products-list')
+
+    response = api_client.get(url, {'page_size': 50})
+    assert len(response.data['results']) == 15
+    assert response.data['count'] == 20
+
+    response = api_client.get(url, {'pagination': 'cursor', 'page_size': 50})
+    assert len(response.data['results']) == 15
+
+    response = api_client.get(response.data['next'])
+    assert [p['title'] for p in response.data['results']] == [f'Product {i}' for i in range(15, 20)]
+    assert response.data['next'] is None
+
+
 @pytest.mark.django_db
 def test_list_product_unauthorized_error(api_client, owner_with_product):
     """Error: Unauthorized user cannot view products list"""
@@ -155,6 +189,185 @@ def test_list_product_unauthorized_error(api_client, owner_with_product):
 
     assert response.status_code == 401
 
+# Export products GET
+
+@pytest.mark.django_db
+def test_export_products_csv_and_ndjson(api_client, owner_with_storage, employee_with_product,
+                                        django_assert_num_queries):
+    """Stock export streams only company's products in one query"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=15, quantity=i,
+                storage=owner_with_storage.company.storage)
+        for i in range(30)
+    ])
+
+    url = reverse('products-export')
+
+    response = api_client.get(url)
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/csv'
+
+    with django_assert_num_queries(1):
+        content = b''.join(response.streaming_content).decode()
+
+    rows = list(csv.reader(content.splitlines()))
+    assert rows[0] == ['id', 'title', 'purchase_price', 'sale_price', 'quantity']
+    assert len(rows) == 31
+    assert rows[-1][1:] == ['Product 29', '10.00', '15.00', '29']
+
+    response = api_client.get(url, {'output': 'ndjson'})
+    products = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    assert len(products) == 30
+    assert products[3]['quantity'] == 3
+
+
+@pytest.mark.django_db
+def test_export_products_errors(api_client, owner_with_product):
+    """Error: unauthorized user or unknown output format"""
+
+    url = reverse('products-export')
+    assert api_client.get(url).status_code == 401
+
+    api_client.force_authenticate(user=owner_with_product)
+    assert api_client.get(url, {'output': 'xlsx'}).status_code == 400
+
+
+# Import products POST
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries('INSERT INTO "products_product"')
+def test_import_products_json_success(api_client, owner_with_storage):
+    """Owner can import a JSON array of products into company storage"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    storage = owner_with_storage.company.storage
+
+    data = [
+        {'title': f'Product {i}', 'purchase_price': 10, 'sale_price': 15}
+        for i in range(50)
+    ]
+    data[0]['storage'] = storage.id
+
+    response = api_client.post(reverse('products-import') + '?batch_size=7', data, format='json')
+    assert response.status_code == 201
+    assert response.data['created'] == 50
+    assert Product.objects.filter(storage=storage, quantity=0).count() == 50
+
+
+@pytest.mark.django_db
+def test_import_products_csv_success(api_client, employee_with_storage):
+    """Employee can import products from CSV with a header row"""
+
+    api_client.force_authenticate(user=employee_with_storage)
+
+    content = 'title,purchase_price,sale_price\nPen,1.50,2.00\nPencil,0.50,0.90\n'
+    response = api_client.post(reverse('products-import'), content, content_type='text/csv')
+
+    assert response.status_code == 201
+    assert response.data['created'] == 2
+    assert str(Product.objects.get(title='Pencil').sale_price) == '0.90'
+
+
+@pytest.mark.django_db
+def test_import_products_row_errors(api_client, owner_with_storage, foreign_company_employee):
+    """Error: invalid rows are reported by index and nothing is created"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    foreign_storage = Storage.objects.create(address='Foreign', company=foreign_company_employee.company)
+
+    data = [
+        {'title': 'Good', 'purchase_price': 10, 'sale_price': 15},
+        {'title': 'Negative', 'purchase_price': -1, 'sale_price': 15},
+        {'title': 'Good too', 'purchase_price': 10, 'sale_price': 15},
+        {'title': 'Foreign', 'purchase_price': 10, 'sale_price': 15, 'storage': foreign_storage.id},
+        {'purchase_price': 10, 'sale_price': 15},
+    ]
+
+    response = api_client.post(reverse('products-import'), data, format='json')
+    assert response.status_code == 400
+
+    errors = response.data['errors']
+    assert [error['row'] for error in errors] == [1, 3, 4]
+    assert 'purchase_price' in errors[0]
+    assert 'storage' in errors[1]
+    assert 'title' in errors[2]
+    assert not Product.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_products_request_errors(api_client, owner_with_storage, employee_with_empty_company):
+    """Error: unauthorized, not a list, bad batch size, broken CSV or company without storage"""
+
+    url = reverse('products-import')
+    row = [{'title': 'Pen', 'purchase_price': 1, 'sale_price': 2}]
+
+    assert api_client.post(url, row, format='json').status_code == 401
+
+    api_client.force_authenticate(user=owner_with_storage)
+    assert api_client.post(url, {'title': 'Pen'}, format='json').status_code == 400
+    assert api_client.post(url, [], format='json').status_code == 400
+    assert api_client.post(url + '?batch_size=0', row, format='json').status_code == 400
+    assert api_client.post(url, b'title\n\xff\n', content_type='text/csv').status_code == 400
+
+    api_client.force_authenticate(user=employee_with_empty_company)
+    assert api_client.post(url, row, format='json').status_code == 400
+
+
+@pytest.mark.django_db
+def test_import_products_ignored_columns_error(api_client, owner_with_storage):
+    """Error: columns that would be silently dropped, like quantity, are rejected"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+
+    content = 'title,purchase_price,sale_price,quantity,color\nPen,1.50,2.00,10,red\n'
+    response = api_client.post(reverse('products-import'), content, content_type='text/csv')
+
+    assert response.status_code == 400
+    assert "['color', 'quantity']" in response.data['columns']
+    assert not Product.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_products_ragged_csv_error(api_client, owner_with_storage):
+    """Error: CSV rows with more fields than the header are reported by index"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+
+    content = 'title,purchase_price,sale_price\nPen,1.50,2.00\nPencil,0.50,0.90,extra\n'
+    response = api_client.post(reverse('products-import'), content, content_type='text/csv')
+
+    assert response.status_code == 400
+    assert response.data['errors'] == [{'row': 1, 'non_field_errors': ['Row has more fields than the header']}]
+    assert not Product.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries('products_product', 'storage_storage')
+def test_import_products_faster_than_single_creates(api_client, owner_with_storage):
+    """Bulk import of N products takes a constant number of queries, per-item create takes O(N)"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    storage = owner_with_storage.company.storage
+    rows = [
+        {'title': f'Product {i}', 'purchase_price': 10, 'sale_price': 15, 'storage': storage.id}
+        for i in range(200)
+    ]
+
+    with CaptureQueriesContext(connection) as single:
+        for row in rows:
+            assert api_client.post(reverse('product-create'), row, format='json').status_code == 201
+
+    with CaptureQueriesContext(connection) as bulk:
+        response = api_client.post(reverse('products-import'), rows, format='json')
+
+    assert response.status_code == 201
+    assert len(bulk) <= 6
+    assert len(single) >= 2 * len(rows)
+    assert Product.objects.filter(storage=storage).count() == 2 * len(rows)
+
+
 # View product GET
 
 @pytest.mark.django_db
@@ -171,6 +384,20 @@ def test_view_product_owner_success(api_client, owner_with_product):
     assert response.data['id'] == product.id
     assert response.data['storage'] == product.storage.id
 
+@pytest.mark.django_db
+def test_view_product_no_extra_queries(api_client, owner_with_product, django_assert_num_queries):
+    """Permission checks compare ids and do not load user's company or product's storage"""
+
+    api_client.force_authenticate(user=owner_with_product)
+    product = Product.objects.get()
+
+    # Data versions and the product
+    with django_assert_num_queries(2):
+        response = api_client.get(reverse('product-detail', args=[product.id]))
+
+    assert response.status_code == 200
+
+
 @pytest.mark.django_db
 def test_view_product_employee_success(api_client, employee_with_product):
     """Employee can view their company's product"""
@@ -219,6 +446,99 @@ def test_view_product_nonexist_error(api_client, owner_with_product):
     assert response.status_code == 404
 
 
+# Conditional GET
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries('"core_dataversion"')
+def test_products_conditional_get(api_client, owner_with_product, django_assert_num_queries):
+    """Unchanged products list and detail answer 304 after one version query, any product write changes the ETag"""
+
+    api_client.force_authenticate(user=owner_with_product)
+    product = Product.objects.get()
+    list_url = reverse('products-list')
+    detail_url = reverse('product-detail', args=[product.id])
+
+    response = api_client.get(list_url)
+    etag, last_modified = response['ETag'], response['Last-Modified']
+
+    with django_assert_num_queries(1):
+        response = api_client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    assert api_client.get(list_url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+    assert api_client.get(list_url, {'page_size': 5}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    detail_etag = api_client.get(detail_url)['ETag']
+    assert api_client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code == 304
+
+    api_client.patch(reverse('product-edit', args=[product.id]), {'title': 'Renamed'}, format='json')
+
+    response = api_client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert api_client.get(list_url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 200
+
+    response = api_client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+    assert response.status_code == 200
+    assert response.data['title'] == 'Renamed'
+
+
+@pytest.mark.django_db
+def test_products_last_modified_not_before_today(api_client, owner_with_product):
+    """Last-Modified moves to midnight with the date in ETag, yesterday's If-Modified-Since gets 200"""
+
+    api_client.force_authenticate(user=owner_with_product)
+    DataVersion.objects.filter(company=owner_with_product.company).update(modified=0)
+    midnight = int(time.mktime(date.today().timetuple()))
+
+    response = api_client.get(reverse('products-list'))
+    assert response['Last-Modified'] == http_date(midnight)
+
+    yesterday = http_date(midnight - 1)
+    assert api_client.get(reverse('products-list'), HTTP_IF_MODIFIED_SINCE=yesterday).status_code == 200
+    assert api_client.get(reverse('products-list'), HTTP_IF_MODIFIED_SINCE=http_date(midnight)).status_code == 304
+
+
+@pytest.mark.django_db
+def test_products_etag_per_company(api_client, owner_with_product, employee_with_product):
+    """Error: ETag of one company does not match another company's list"""
+
+    api_client.force_authenticate(user=owner_with_product)
+    etag = api_client.get(reverse('products-list'))['ETag']
+
+    api_client.force_authenticate(user=employee_with_product)
+    response = api_client.get(reverse('products-list'), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['results'][0]['storage'] == employee_with_product.company.storage.id
+
+
+@pytest.mark.django_db
+def test_products_etag_follows_any_write(api_client, owner_with_product):
+    """ETag is kept in the database: it survives the cache and changes with model saves and storage delete"""
+
+    api_client.force_authenticate(user=owner_with_product)
+    url = reverse('products-list')
+    etag = api_client.get(url)['ETag']
+
+    cache.clear()
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    product = Product.objects.get()
+    product.sale_price = 200
+    product.save()
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    etag = response['ETag']
+
+    response = api_client.delete(reverse('storage-delete', args=[owner_with_product.company.storage.id]))
+    assert response.status_code == 204
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['results'] == []
+
+
 # Edit product PUT
 @pytest.mark.django_db
 def test_edit_product_owner_success(api_client, owner_with_product):
@@ -474,4 +794,13 @@ def test_delete_product_nonexist_error(api_client, owner_with_product):
     assert response.status_code == 404
 
 
+# Query plans
+
+@pytest.mark.django_db
+def test_products_list_query_uses_indexes(owner_with_product, assert_no_full_scan):
+    """Products list query is an index search on storage and products"""
 
+    assert_no_full_scan(
+        Product.objects.filter(storage__company=owner_with_product.company).order_by('id'),
+        'storage_storage', 'products_product'
+    )
@@ -1,9 +1,12 @@
 from django.urls import path
-from.views import ProductCreateView, ProductDetailView, ProductEditView, ProductDeleteView, ProductListView
+from.views import (ProductCreateView, ProductDetailView, ProductEditView, ProductDeleteView, ProductListView,
+                   ProductExportView, ProductImportView)
 
 urlpatterns = [
     path('create/', ProductCreateView.as_view(), name='product-create'),
+    path('import/', ProductImportView.as_view(), name='products-import'),
     path('list/', ProductListView.as_view(), name='products-list'),
+    path('export/', ProductExportView.as_view(), name='products-export'),
     path('<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
     path('<int:pk>/edit/', ProductEditView.as_view(), name='product-edit'),
     path('<int:pk>/delete/', ProductDeleteView.as_view(), name='product-delete')
@@ -1,9 +1,20 @@
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
 
 from .models import Product
-from .serializers import ProductSerializer
+from .serializers import ProductSerializer, ProductImportSerializer
 from .permissions import ProductPermission
 from storage.models import Storage
+from core.conditional import ConditionalGetMixin, bump_versions
+from core.parsers import CSVParser
+from core.tenant import get_tenant
+from utils import parse_limit, stream_csv, stream_ndjson
+
+EXPORT_COLUMNS = ['id', 'title', 'purchase_price', 'sale_price', 'quantity']
 
 class ProductCreateView(generics.CreateAPIView):
     """Create new product"""
@@ -12,26 +23,133 @@ class ProductCreateView(generics.CreateAPIView):
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated, ProductPermission]
 
-class ProductListView(generics.ListAPIView):
+class ProductImportView(generics.GenericAPIView):
+    """
+    Create many products at once from a JSON array or CSV with a header row.
+    All rows are validated first, errors are reported per row, then products
+    are inserted with bulk_create (?batch_size=) in one transaction.
+    Columns that are not imported (e.g. quantity, changed only by supplies and sales) are rejected
+    """
+
+    serializer_class = ProductImportSerializer
+    permission_classes = [permissions.IsAuthenticated, ProductPermission]
+    parser_classes = [JSONParser, CSVParser]
+    batch_size = 1000
+    max_batch_size = 5000
+
+    def post(self, request):
+        rows = request.data
+
+        if not isinstance(rows, list) or not rows:
+            raise ValidationError('Expected a non-empty list of products')
+
+        batch_size = parse_limit(request.query_params.get('batch_size'), default=self.batch_size,
+                                 max_limit=self.max_batch_size, limit_name='batch_size')
+
+        storage_ids = set(
+            Storage.objects.filter(company_id=get_tenant(request).company_id).values_list('id', flat=True)
+        )
+
+        if not storage_ids:
+            raise ValidationError('Company has no storage')
+
+        # CSV rows with more fields than the header keep the extra values under None
+        ragged = [i for i, row in enumerate(rows) if isinstance(row, dict) and None in row]
+
+        if ragged:
+            errors = [{'row': i, 'non_field_errors': ['Row has more fields than the header']} for i in ragged]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        columns = set().union(*(row.keys() for row in rows if isinstance(row, dict)))
+        ignored = sorted(columns - set(self.serializer_class.import_columns))
+
+        if ignored:
+            raise ValidationError({'columns': f'Columns cannot be imported: {ignored}'})
+
+        serializer = self.get_serializer(data=rows, many=True, context={
+            **self.get_serializer_context(),
+            'storage_ids': storage_ids
+        })
+
+        if not serializer.is_valid():
+            row_errors = serializer.errors
+            # Older DRF returns a list aligned with rows, newer - a dict of invalid rows only
+            if isinstance(row_errors, list):
+                row_errors = dict(enumerate(row_errors))
+
+            errors = [{'row': i, **row_errors[i]} for i in sorted(row_errors) if row_errors[i]]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        products = [
+            Product(
+                title=row['title'],
+                purchase_price=row['purchase_price'],
+                sale_price=row['sale_price'],
+                storage_id=row['storage']
+            )
+            for row in serializer.validated_data
+        ]
+
+        with transaction.atomic():
+            Product.objects.bulk_create(products, batch_size=batch_size)
+            bump_versions('products', company_id=get_tenant(request).company_id)
+
+        return Response({'created': len(products)}, status=status.HTTP_201_CREATED)
+
+
+class ProductListView(ConditionalGetMixin, generics.ListAPIView):
     """View all products"""
 
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated, ProductPermission]
+    version_models = ('products',)
+    keyset_ordering = ('id',)
 
     def get_queryset(self):
         return Product.objects.filter(
-            storage__company=self.request.user.company
+            storage__company_id=get_tenant(self.request).company_id
         ).order_by('id')
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductExportView(generics.GenericAPIView):
+    """Stream company's products with stock levels as CSV (default) or NDJSON (?output=ndjson)"""
+
+    permission_classes = [permissions.IsAuthenticated, ProductPermission]
+    chunk_size = 5000
+
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+
+        if output not in ('ndjson', 'csv'):
+            raise ValidationError('output should be ndjson or csv')
+
+        rows = (Product.objects
+                .filter(storage__company_id=get_tenant(request).company_id)
+                .order_by('id')
+                .values_list(*EXPORT_COLUMNS)
+                .iterator(chunk_size=self.chunk_size))
+
+        if output == 'csv':
+            response = StreamingHttpResponse(stream_csv(EXPORT_COLUMNS, rows), content_type='text/csv')
+        else:
+            response = StreamingHttpResponse(
+                stream_ndjson(dict(zip(EXPORT_COLUMNS, row)) for row in rows),
+                content_type='application/x-ndjson'
+            )
+
+        response['Content-Disposition'] = f'attachment; filename="products.{output}"'
+        return response
+
+class ProductDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """View Product details"""
 
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated, ProductPermission]
+    version_models = ('products',)
+
     def get_queryset(self):
         return Product.objects.filter(
-            storage__company=self.request.user.company
-        )
+            storage__company_id=get_tenant(self.request).company_id
+        ).select_related('storage')
 
 class ProductEditView(generics.UpdateAPIView):
     """Edit products detail"""
@@ -41,8 +159,8 @@ class ProductEditView(generics.UpdateAPIView):
 
     def get_queryset(self):
         return Product.objects.filter(
-            storage__company=self.request.user.company
-        )
+            storage__company_id=get_tenant(self.request).company_id
+        ).select_related('storage')
 
 class ProductDeleteView(generics.DestroyAPIView):
     """Delete product detail"""
@@ -52,5 +170,5 @@ class ProductDeleteView(generics.DestroyAPIView):
 
     def get_queryset(self):
         return Product.objects.filter(
-            storage__company=self.request.user.company
-        )
+            storage__company_id=get_tenant(self.request).company_id
+        ).select_related('storage')
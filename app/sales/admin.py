@@ -1,10 +1,11 @@
 from django.contrib import admin
-from .models import Sale, ProductSale
+from .models import Sale, ProductSale, DailyProfit, ProductSalesTotal
+from core.conditional import bump_versions
 
 class SaleProductInline(admin.TabularInline):
     model = ProductSale
-    readonly_fields = ('price_at_sale', 'total_price')
-    fields = ('product', 'quantity', 'price_at_sale', 'total_price')
+    readonly_fields = ('price_at_sale', 'purchase_price_at_sale', 'total_price')
+    fields = ('product', 'quantity', 'price_at_sale', 'purchase_price_at_sale', 'total_price')
     extra = 0
 
     def total_price(self, obj):
@@ -14,10 +15,25 @@ class SaleProductInline(admin.TabularInline):
 
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
-    list_display = ['id', 'company_id', 'buyer_name', 'sale_date']
+    list_display = ['id', 'company_id', 'buyer_name', 'sale_date', 'client_key']
     list_display_links = ['id', 'company_id']
     list_filter = ['sale_date', 'company__title']
 
     inlines = [SaleProductInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # After the lines, like the API (see core.conditional.bump_versions)
+        bump_versions('sales', 'products', company_id=form.instance.company_id)
 
+
+@admin.register(DailyProfit)
+class DailyProfitAdmin(admin.ModelAdmin):
+    list_display = ['id', 'company_id', 'date', 'revenue', 'profit', 'sales_count']
+    list_filter = ['date', 'company__title']
+
+
+@admin.register(ProductSalesTotal)
+class ProductSalesTotalAdmin(admin.ModelAdmin):
+    list_display = ['id', 'company_id', 'product_id', 'units_sold', 'revenue', 'profit']
+    list_filter = ['company__title']
@@ -2,3 +2,6 @@ from django.apps import AppConfig
 
 class SalesConfig(AppConfig):
     name = 'sales'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,148 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+
+from .models import Sale, ProductSale
+from .rollup import record_sales
+from core.conditional import bump_versions
+from products.models import Product
+from products.stock import reserve_stock
+from utils import calculate_price_at_sale
+
+
+def _error(errors):
+    return {'status': 'error', 'errors': errors}
+
+
+def _allocate(quantities, stock):
+    """
+    Go through sales in order and accept those that still fit in stock.
+    Returns accepted keys and errors of sales that do not fit
+    """
+
+    left = dict(stock)
+    accepted, errors = [], {}
+
+    for key, sale_quantities in quantities.items():
+        short = {pk: left[pk] for pk, qty in sale_quantities.items() if left[pk] < qty}
+
+        if short:
+            errors[key] = short
+            continue
+
+        for pk, qty in sale_quantities.items():
+            left[pk] -= qty
+
+        accepted.append(key)
+
+    return accepted, errors
+
+
+def _ingest(company_id, sales):
+    results = {}
+
+    existing = dict(
+        Sale.objects
+        .filter(company_id=company_id, client_key__in=sales)
+        .values_list('client_key', 'id')
+    )
+
+    for key, sale_id in existing.items():
+        results[key] = {'status': 'duplicate', 'id': sale_id}
+
+    pending = {key: data for key, data in sales.items() if key not in existing}
+
+    product_ids = {line['product'] for data in pending.values() for line in data['product_sales']}
+    products = (Product.objects
+                .filter(id__in=product_ids, storage__company_id=company_id)
+                .only('id', 'title', 'sale_price', 'purchase_price', 'quantity')
+                .in_bulk())
+
+    quantities = {}
+    for key, data in pending.items():
+        sale_quantities = {}
+        for line in data['product_sales']:
+            sale_quantities[line['product']] = sale_quantities.get(line['product'], 0) + line['quantity']
+
+        unknown = sorted(pk for pk in sale_quantities if pk not in products)
+
+        if unknown:
+            results[key] = _error({'product_sales': [f'Products do not exist or belong to another company: {unknown}']})
+        else:
+            quantities[key] = sale_quantities
+
+    stock = {pk: product.quantity for pk, product in products.items()}
+
+    with transaction.atomic():
+        # Stock read above may be stale, reserve the net decrement and re-allocate if it fell short
+        while True:
+            accepted, short = _allocate(quantities, stock)
+
+            total = {}
+            for key in accepted:
+                for pk, qty in quantities[key].items():
+                    total[pk] = total.get(pk, 0) + qty
+
+            short_products = reserve_stock(total)
+
+            if not short_products:
+                break
+
+            for product in short_products:
+                stock[product.id] = product.quantity
+
+        for key, available in short.items():
+            results[key] = _error({
+                f'quantity: Not enough {products[pk].title}': qty
+                for pk, qty in available.items()
+            })
+
+        created = Sale.objects.bulk_create([
+            Sale(
+                company_id=company_id,
+                client_key=key,
+                buyer_name=pending[key]['buyer_name'],
+                sale_date=pending[key]['sale_date'],
+                discount=pending[key].get('discount', Decimal('0'))
+            )
+            for key in accepted
+        ])
+
+        ProductSale.objects.bulk_create([
+            ProductSale(
+                sale=sale,
+                product_id=line['product'],
+                quantity=line['quantity'],
+                price_at_sale=calculate_price_at_sale(products[line['product']].sale_price, sale.discount),
+                purchase_price_at_sale=products[line['product']].purchase_price
+            )
+            for sale in created
+            for line in pending[sale.client_key]['product_sales']
+        ], batch_size=1000)
+
+        record_sales(created)
+
+        # Replayed batches of duplicates keep ETags of the company
+        if created:
+            bump_versions('sales', 'products', company_id=company_id)
+
+    for sale in created:
+        results[sale.client_key] = {'status': 'created', 'id': sale.id}
+
+    return results
+
+
+def ingest_sales(company_id, sales):
+    """
+    Create a batch of validated sales of one company: {client_key: validated data}.
+    Product ownership and stock are checked for the whole batch at once, sales
+    are created in bulk and stock of each product is decremented once.
+    Returns {client_key: result}, result status is created, duplicate
+    (sale with this key was uploaded before) or error
+    """
+
+    try:
+        return _ingest(company_id, sales)
+    except IntegrityError:
+        # The same keys were uploaded concurrently, they are duplicates now
+        return _ingest(company_id, sales)
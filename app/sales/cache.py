@@ -0,0 +1,110 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from rest_framework.response import Response
+
+from core.caches import is_shared_cache
+from core.tenant import get_tenant
+
+VERSION_KEY = 'analytics:version:{}'
+STATS_KEY = 'analytics:{}'
+
+
+def get_analytics_version(company_id):
+    version = cache.get(VERSION_KEY.format(company_id))
+
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(VERSION_KEY.format(company_id), version, timeout=None)
+        version = cache.get(VERSION_KEY.format(company_id), version)
+
+    return version
+
+
+def _bump_versions(company_ids):
+    cache.set_many({VERSION_KEY.format(pk): uuid.uuid4().hex for pk in company_ids}, timeout=None)
+
+
+def invalidate_analytics(*company_ids):
+    """
+    Drop cached analytics of the companies. Versions are bumped right away and
+    again on commit, so a response read before the commit is not cached for good
+    """
+
+    _bump_versions(company_ids)
+    transaction.on_commit(lambda: _bump_versions(company_ids))
+
+
+def _count(event):
+    key = STATS_KEY.format(event)
+    cache.add(key, 0, timeout=None)
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.add(key, 1, timeout=None)
+
+
+def analytics_cache_stats():
+    """Hits and misses of the analytics cache: {'hits': n, 'misses': n}"""
+
+    counters = cache.get_many([STATS_KEY.format('hits'), STATS_KEY.format('misses')])
+
+    return {
+        'hits': counters.get(STATS_KEY.format('hits'), 0),
+        'misses': counters.get(STATS_KEY.format('misses'), 0),
+    }
+
+
+def reset_analytics_cache_stats():
+    cache.delete_many([STATS_KEY.format('hits'), STATS_KEY.format('misses')])
+
+
+class CachedAnalyticsMixin:
+    """
+    Caches list response of an analytics view per company and normalized parameters.
+    cache_params is a function of the request returning parameters that change the
+    response, with dates resolved to actual dates. Cache is dropped by invalidate_analytics
+    on every sale change and product edit. Response has X-Cache: HIT or MISS header.
+    Off with a per-process cache (default locmem): other workers would not see invalidations
+    """
+
+    cache_params = None
+
+    def get_cache_key(self, request):
+        if self.cache_params is None:
+            raise ImproperlyConfigured(f'{type(self).__name__} should set cache_params')
+
+        company_id = get_tenant(request).company_id
+        params = [(key, str(value)) for key, value in sorted(self.cache_params(request).items())]
+        params += sorted((key, value) for key, value in request.query_params.items()
+                         if key in ('page', 'page_size'))
+
+        digest = hashlib.md5(repr(params).encode()).hexdigest()
+
+        return f'analytics:{type(self).__name__}:{company_id}:{get_analytics_version(company_id)}:{digest}'
+
+    def list(self, request, *args, **kwargs):
+        if not is_shared_cache(settings.CACHES):
+            return super().list(request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+
+        if data is not None:
+            _count('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _count('misses')
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data, timeout=getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 300))
+        response['X-Cache'] = 'MISS'
+
+        return response
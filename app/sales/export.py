@@ -0,0 +1,38 @@
+from itertools import groupby
+
+SALE_COLUMNS = ['id', 'sale_date', 'buyer_name', 'discount']
+LINE_COLUMNS = ['product', 'title', 'quantity', 'price_at_sale', 'purchase_price_at_sale']
+
+CSV_HEADER = ['sale_id', 'sale_date', 'buyer_name', 'discount'] + LINE_COLUMNS
+
+
+def iter_sale_rows(queryset, chunk_size):
+    """
+    One flat tuple per sale line (sale columns + line columns), read with a
+    server-side iterator. Sales without lines give one row with empty line columns
+    """
+
+    return (queryset
+            .order_by('sale_date', 'id', 'sales_items__id')
+            .values_list(
+                'id', 'sale_date', 'buyer_name', 'discount',
+                'sales_items__product_id', 'sales_items__product__title', 'sales_items__quantity',
+                'sales_items__price_at_sale', 'sales_items__purchase_price_at_sale'
+            )
+            .iterator(chunk_size=chunk_size))
+
+
+def iter_sales(rows):
+    """Group consecutive line rows into one dict per sale with its lines"""
+
+    sale_size = len(SALE_COLUMNS)
+
+    for sale, lines in groupby(rows, key=lambda row: row[:sale_size]):
+        yield {
+            **dict(zip(SALE_COLUMNS, sale)),
+            'lines': [
+                dict(zip(LINE_COLUMNS, line[sale_size:]))
+                for line in lines
+                if line[sale_size] is not None
+            ]
+        }
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from core.caches import require_shared_cache
+from sales.cache import analytics_cache_stats, reset_analytics_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hits and misses of the analytics cache collected by all workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the counters after showing them')
+
+    def handle(self, *args, **options):
+        # Analytics are not cached with a per-process cache, there is nothing to count
+        try:
+            require_shared_cache(settings.CACHES, 'Analytics cache')
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+
+        stats = analytics_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = f'{stats["hits"] / total:.1%}' if total else '-'
+
+        self.stdout.write(f'hits: {stats["hits"]}, misses: {stats["misses"]}, hit ratio: {ratio}')
+
+        if options['reset']:
+            reset_analytics_cache_stats()
+            self.stdout.write('Counters cleared')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.rollup import find_mismatches, rebuild_sales_analytics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild sales analytics rollups from sale lines and verify they match the live aggregates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, action='append', dest='companies',
+                            help='Limit to company id (can be repeated)')
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare rollups with the live aggregates, do not rebuild')
+
+    def handle(self, *args, **options):
+        company_ids = options['companies']
+
+        if not options['check']:
+            written = rebuild_sales_analytics(company_ids)
+
+            for table, count in written.items():
+                self.stdout.write(f'Rebuilt {count} {table} rows')
+
+        mismatches = find_mismatches(company_ids)
+
+        for table, key, stored, live in mismatches:
+            self.stderr.write(f'{table} {key}: stored {stored}, live {live}')
+
+        if mismatches:
+            raise CommandError(f'Sales analytics rollups differ from sales in {len(mismatches)} rows')
+
+        self.stdout.write(self.style.SUCCESS('Sales analytics rollups match sales'))
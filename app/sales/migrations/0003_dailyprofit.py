@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def backfill_daily_profit(apps, schema_editor):
+    """Daily totals of existing sales, lines are valued at the product's current purchase price"""
+
+    SaleProduct = apps.get_model('sales', 'SaleProduct')
+    DailyProfit = apps.get_model('sales', 'DailyProfit')
+
+    rows = (SaleProduct.objects
+            .values('sale__company_id', 'sale__sale_date')
+            .annotate(revenue=Sum(F('price_at_sale') * F('quantity')),
+                      profit=Sum((F('price_at_sale') - F('product__purchase_price')) * F('quantity')),
+                      sales_count=Count('sale', distinct=True))
+            .order_by())
+
+    DailyProfit.objects.bulk_create([
+        DailyProfit(company_id=row['sale__company_id'], date=row['sale__sale_date'],
+                    revenue=row['revenue'], profit=row['profit'], sales_count=row['sales_count'])
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('products', '0001_initial'),
+        ('sales', '0002_saleproduct_price_at_sale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProfit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sales_count', models.IntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_profits', to='companies.company')),
+            ],
+            options={
+                'verbose_name': 'Daily profit',
+                'verbose_name_plural': 'Daily profits',
+                'constraints': [models.UniqueConstraint(fields=('company', 'date'), name='unique_company_daily_profit')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_profit, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_purchase_price(apps, schema_editor):
+    """Existing lines get the product's current purchase price"""
+
+    SaleProduct = apps.get_model('sales', 'SaleProduct')
+    Product = apps.get_model('products', 'Product')
+
+    SaleProduct.objects.filter(purchase_price_at_sale__isnull=True).update(
+        purchase_price_at_sale=Subquery(
+            Product.objects.filter(id=OuterRef('product_id')).values('purchase_price')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+        ('sales', '0003_dailyprofit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleproduct',
+            name='purchase_price_at_sale',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(backfill_purchase_price, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='saleproduct',
+            name='purchase_price_at_sale',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def _product_sales(SaleProduct, *keys):
+    return (SaleProduct.objects
+            .values('sale__company_id', 'product_id', *keys)
+            .annotate(units_sold=Sum('quantity'),
+                      revenue=Sum(F('price_at_sale') * F('quantity')),
+                      profit=Sum((F('price_at_sale') - F('purchase_price_at_sale')) * F('quantity')))
+            .order_by())
+
+
+def backfill_product_sales(apps, schema_editor):
+    """Per-product totals and daily sales of existing sale lines"""
+
+    SaleProduct = apps.get_model('sales', 'SaleProduct')
+    ProductSalesTotal = apps.get_model('sales', 'ProductSalesTotal')
+    ProductDailySales = apps.get_model('sales', 'ProductDailySales')
+
+    ProductSalesTotal.objects.bulk_create([
+        ProductSalesTotal(company_id=row['sale__company_id'], product_id=row['product_id'],
+                          units_sold=row['units_sold'], revenue=row['revenue'], profit=row['profit'])
+        for row in _product_sales(SaleProduct)
+    ], batch_size=1000)
+
+    ProductDailySales.objects.bulk_create([
+        ProductDailySales(company_id=row['sale__company_id'], product_id=row['product_id'],
+                          date=row['sale__sale_date'], units_sold=row['units_sold'],
+                          revenue=row['revenue'], profit=row['profit'])
+        for row in _product_sales(SaleProduct, 'sale__sale_date')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('products', '0001_initial'),
+        ('sales', '0004_saleproduct_purchase_price_at_sale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('units_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_sales_totals', to='companies.company')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales_total', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Product sales total',
+                'verbose_name_plural': 'Product sales totals',
+                'indexes': [
+                    models.Index(fields=['company', '-units_sold'], name='product_total_units_idx'),
+                    models.Index(fields=['company', '-profit'], name='product_total_profit_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_daily_sales', to='companies.company')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Product daily sales',
+                'verbose_name_plural': 'Product daily sales',
+                'indexes': [models.Index(fields=['company', 'date'], name='product_daily_company_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'date'), name='unique_product_daily_sales')],
+            },
+        ),
+        migrations.RunPython(backfill_product_sales, migrations.RunPython.noop),
+    ]
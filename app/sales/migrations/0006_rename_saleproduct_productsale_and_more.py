@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('products', '0001_initial'),
+        ('sales', '0005_productsalestotal_productdailysales'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='SaleProduct',
+            new_name='ProductSale',
+        ),
+        migrations.AlterField(
+            model_name='productsale',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_sale_items', to='products.product'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['company', 'sale_date'], name='sale_company_date_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('sales', '0006_rename_saleproduct_productsale_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='client_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='sale',
+            constraint=models.UniqueConstraint(fields=('company', 'client_key'), name='unique_company_sale_client_key'),
+        ),
+    ]
@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import ForeignKey
 from decimal import Decimal
 
+from rest_framework.exceptions import ValidationError
+
+from products.stock import collect_quantities, move_stock, reserve_stock
+
 class Sale(models.Model):
     company = models.ForeignKey(
         'companies.Company',
@@ -12,25 +16,52 @@ class Sale(models.Model):
     buyer_name = models.CharField(max_length=256)
     sale_date = models.DateField()
     discount = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    client_key = models.CharField(max_length=64, null=True, blank=True)
 
     class Meta:
         verbose_name = 'Sale'
         verbose_name_plural = 'Sales'
+        indexes = [
+            models.Index(fields=['company', 'sale_date'], name='sale_company_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'client_key'], name='unique_company_sale_client_key')
+        ]
+
+    def apply(self, quantities=None):
+        """
+        Take sold quantities out of stock and add the sale to daily totals.
+        Raises ValidationError, leaving stock untouched, when a product is short.
+        quantities: {product_id: quantity} if already known, read from lines otherwise
+        """
+
+        from .rollup import record_sale
 
-    def apply(self):
-        for sp in self.sales_items.all():
-            sp.product.quantity -= sp.quantity
-            sp.product.save()
+        if quantities is None:
+            quantities = collect_quantities(self.sales_items)
 
+        short = reserve_stock(quantities)
+
+        if short:
+            raise ValidationError({
+                f'quantity: Not enough {product.title}': product.quantity
+                for product in short
+            })
+
+        record_sale(self)
 
     def rollback(self):
-        for sp in self.sales_items.all():
-            sp.product.quantity += sp.quantity
-            sp.product.save()
+        """Return sold quantities to stock and remove the sale from daily totals"""
+
+        from .rollup import record_sale
+
+        move_stock(collect_quantities(self.sales_items))
+        record_sale(self, sign=-1)
 
     def delete(self, *args, **kwargs):
-        self.rollback()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            self.rollback()
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f'Sale #{self.id}, {self.buyer_name}'
@@ -51,11 +82,104 @@ class ProductSale(models.Model):
     quantity = models.PositiveIntegerField()
 
     price_at_sale = models.DecimalField(max_digits=10, decimal_places=2)
+    purchase_price_at_sale = models.DecimalField(max_digits=10, decimal_places=2)
 
     def save(self, *args, **kwargs):
         if self.price_at_sale is None:
             self.price_at_sale = self.product.sale_price * (1 - self.sale.discount / 100)
+        if self.purchase_price_at_sale is None:
+            self.purchase_price_at_sale = self.product.purchase_price
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f'{self.product.title} - {self.quantity} x ${self.price_at_sale}'
\ No newline at end of file
+        return f'{self.product.title} - {self.quantity} x ${self.price_at_sale}'
+
+
+class DailyProfit(models.Model):
+    """Revenue and profit of a company's sales per day, kept up to date on every sale change"""
+
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='daily_profits'
+    )
+
+    date = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sales_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Daily profit'
+        verbose_name_plural = 'Daily profits'
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'date'], name='unique_company_daily_profit')
+        ]
+
+    def __str__(self):
+        return f'{self.company_id} {self.date}: {self.profit}'
+
+
+class ProductSalesTotal(models.Model):
+    """Units sold, revenue and profit of a product over all time, kept up to date on every sale change"""
+
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='product_sales_totals'
+    )
+
+    product = models.OneToOneField(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='sales_total'
+    )
+
+    units_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Product sales total'
+        verbose_name_plural = 'Product sales totals'
+        indexes = [
+            models.Index(fields=['company', '-units_sold'], name='product_total_units_idx'),
+            models.Index(fields=['company', '-profit'], name='product_total_profit_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {self.units_sold}'
+
+
+class ProductDailySales(models.Model):
+    """Units sold, revenue and profit of a product per day, used for top products over a date range"""
+
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='product_daily_sales'
+    )
+
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='daily_sales'
+    )
+
+    date = models.DateField()
+    units_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Product daily sales'
+        verbose_name_plural = 'Product daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='unique_product_daily_sales')
+        ]
+        indexes = [
+            models.Index(fields=['company', 'date'], name='product_daily_company_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} {self.date}: {self.units_sold}'
@@ -1,10 +1,12 @@
 from rest_framework import permissions
 
+from core.tenant import get_tenant
+
 class SalePermissions(permissions.BasePermission):
     """Allows access to sales' info and actions only to company owner and employees"""
 
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.company
+        return get_tenant(request).has_company
 
     def has_object_permission(self, request, view, obj):
-        return obj.company == request.user.company
\ No newline at end of file
+        return obj.company_id == get_tenant(request).company_id
@@ -0,0 +1,295 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (Case, Count, DecimalField, Exists, F, IntegerField, OuterRef, Subquery, Sum,
+                              Value, When)
+from django.db.models.functions import Coalesce
+
+from companies.models import Company
+from .cache import invalidate_analytics
+from .models import DailyProfit, ProductDailySales, ProductSale, ProductSalesTotal, Sale
+
+CENT = Decimal('0.01')
+
+
+def _totals():
+    """Revenue and profit aggregates over sale lines"""
+
+    return dict(
+        revenue=Sum(F('price_at_sale') * F('quantity')),
+        profit=Sum((F('price_at_sale') - F('purchase_price_at_sale')) * F('quantity')),
+    )
+
+
+def _money(value):
+    return Decimal(value).quantize(CENT)
+
+
+def _per_product(rows, field, sign, output_field):
+    return Case(
+        *[When(product_id=row['product_id'], then=Value(sign * row[field])) for row in rows],
+        default=Value(0),
+        output_field=output_field
+    )
+
+
+def _add_to_product_counters(model, rows, sign, **keys):
+    """Add per-product sums to counter rows with given keys, creating missing rows: 2 queries"""
+
+    model.objects.bulk_create(
+        [model(product_id=row['product_id'], **keys) for row in rows],
+        ignore_conflicts=True
+    )
+
+    model.objects.filter(product_id__in=[row['product_id'] for row in rows], **keys).update(
+        units_sold=F('units_sold') + _per_product(rows, 'units_sold', sign, IntegerField()),
+        revenue=F('revenue') + _per_product(rows, 'revenue', sign, DecimalField(max_digits=14, decimal_places=2)),
+        profit=F('profit') + _per_product(rows, 'profit', sign, DecimalField(max_digits=14, decimal_places=2)),
+    )
+
+
+def record_sale(sale, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) a sale from its company's analytics:
+    daily profit, per-product totals and per-product daily sales
+    """
+
+    record_sales([sale], sign)
+
+
+def _add_line(products, line):
+    row = products.setdefault(line['product_id'], {
+        'product_id': line['product_id'], 'units_sold': 0, 'revenue': Decimal(0), 'profit': Decimal(0)
+    })
+
+    row['units_sold'] += line['units_sold']
+    row['revenue'] += line['revenue']
+    row['profit'] += line['profit']
+
+
+def record_sales(sales, sign=1):
+    """
+    Add or remove several sales from analytics. Lines are read in one query
+    and counters are updated once per company and sale date, not per sale
+    """
+
+    sales = {sale.id: sale for sale in sales}
+
+    lines = (ProductSale.objects
+             .filter(sale_id__in=sales)
+             .values('sale_id', 'product_id')
+             .annotate(units_sold=Sum('quantity'), **_totals())
+             .order_by())
+
+    days = {}
+    companies = {}
+
+    for line in lines:
+        line = {**line, 'revenue': _money(line['revenue']), 'profit': _money(line['profit'])}
+        sale = sales[line['sale_id']]
+
+        day = days.setdefault((sale.company_id, sale.sale_date), {'sales': set(), 'products': {}})
+        day['sales'].add(sale.id)
+        _add_line(day['products'], line)
+        _add_line(companies.setdefault(sale.company_id, {}), line)
+
+    if not days:
+        return
+
+    with transaction.atomic():
+        for (company_id, sale_date), day in days.items():
+            rows = list(day['products'].values())
+
+            DailyProfit.objects.get_or_create(company_id=company_id, date=sale_date)
+
+            DailyProfit.objects.filter(company_id=company_id, date=sale_date).update(
+                revenue=F('revenue') + sign * sum(row['revenue'] for row in rows),
+                profit=F('profit') + sign * sum(row['profit'] for row in rows),
+                sales_count=F('sales_count') + sign * len(day['sales'])
+            )
+
+            _add_to_product_counters(ProductDailySales, rows, sign, company_id=company_id, date=sale_date)
+
+        for company_id, products in companies.items():
+            _add_to_product_counters(ProductSalesTotal, list(products.values()), sign, company_id=company_id)
+
+    invalidate_analytics(*companies)
+
+
+def remove_product_sales(product):
+    """
+    Take sale lines of a product that is about to be deleted out of daily profit,
+    the product's own counters are deleted with it. Returns ids of the affected
+    DailyProfit rows, their sales_count is fixed by recount_sales once lines are gone
+    """
+
+    money = DecimalField(max_digits=14, decimal_places=2)
+    day_lines = (ProductSale.objects
+                 .filter(product=product, sale__company_id=OuterRef('company_id'), sale__sale_date=OuterRef('date'))
+                 .values('product_id')
+                 .annotate(**_totals())
+                 .order_by())
+
+    days = list(DailyProfit.objects.filter(Exists(day_lines)).values_list('id', 'company_id'))
+
+    if days:
+        DailyProfit.objects.filter(id__in=[day_id for day_id, _ in days]).update(
+            revenue=F('revenue') - Subquery(day_lines.values('revenue'), output_field=money),
+            profit=F('profit') - Subquery(day_lines.values('profit'), output_field=money)
+        )
+        invalidate_analytics(*{company_id for _, company_id in days})
+
+    return [day_id for day_id, _ in days]
+
+
+def recount_sales(day_ids):
+    """Set sales_count of given DailyProfit rows to the number of sales that still have lines"""
+
+    if not day_ids:
+        return
+
+    sales = (Sale.objects
+             .filter(company_id=OuterRef('company_id'), sale_date=OuterRef('date'), sales_items__isnull=False)
+             .values('company_id')
+             .annotate(count=Count('id', distinct=True))
+             .values('count'))
+
+    DailyProfit.objects.filter(id__in=day_ids).update(sales_count=Coalesce(Subquery(sales), 0))
+
+
+def _lines(company_ids):
+    lines = ProductSale.objects.all()
+
+    if company_ids is not None:
+        lines = lines.filter(sale__company_id__in=company_ids)
+
+    return lines
+
+
+def live_daily_profit(company_ids=None):
+    """Daily totals computed from sale lines: {(company_id, date): (revenue, profit, sales_count)}"""
+
+    rows = (_lines(company_ids)
+            .values('sale__company_id', 'sale__sale_date')
+            .annotate(**_totals(), sales_count=Count('sale', distinct=True))
+            .order_by())
+
+    return {
+        (row['sale__company_id'], row['sale__sale_date']):
+            (_money(row['revenue']), _money(row['profit']), row['sales_count'])
+        for row in rows
+    }
+
+
+def stored_daily_profit(company_ids=None):
+    """Daily totals from the rollup table, same shape as live_daily_profit"""
+
+    rows = DailyProfit.objects.filter(sales_count__gt=0)
+
+    if company_ids is not None:
+        rows = rows.filter(company_id__in=company_ids)
+
+    return {
+        (row.company_id, row.date): (row.revenue, row.profit, row.sales_count)
+        for row in rows
+    }
+
+
+def live_product_sales(company_ids=None, by_date=False):
+    """
+    Per-product totals computed from sale lines:
+    {(company_id, product_id[, date]): (units_sold, revenue, profit)}
+    """
+
+    keys = ['sale__company_id', 'product_id'] + (['sale__sale_date'] if by_date else [])
+
+    rows = (_lines(company_ids)
+            .values(*keys)
+            .annotate(units_sold=Sum('quantity'), **_totals())
+            .order_by())
+
+    return {
+        tuple(row[key] for key in keys): (row['units_sold'], _money(row['revenue']), _money(row['profit']))
+        for row in rows
+    }
+
+
+def stored_product_sales(company_ids=None, by_date=False):
+    """Per-product counters from the rollup tables, same shape as live_product_sales"""
+
+    model = ProductDailySales if by_date else ProductSalesTotal
+    rows = model.objects.exclude(units_sold=0)
+
+    if company_ids is not None:
+        rows = rows.filter(company_id__in=company_ids)
+
+    return {
+        (row.company_id, row.product_id) + ((row.date,) if by_date else ()):
+            (row.units_sold, row.revenue, row.profit)
+        for row in rows
+    }
+
+
+def rebuild_sales_analytics(company_ids=None):
+    """Recalculate all rollup tables from sale lines, returns number of rows written per table"""
+
+    daily_profit = live_daily_profit(company_ids)
+    product_totals = live_product_sales(company_ids)
+    product_daily = live_product_sales(company_ids, by_date=True)
+
+    with transaction.atomic():
+        for model in (DailyProfit, ProductSalesTotal, ProductDailySales):
+            rows = model.objects.all()
+
+            if company_ids is not None:
+                rows = rows.filter(company_id__in=company_ids)
+
+            rows.delete()
+
+        DailyProfit.objects.bulk_create([
+            DailyProfit(company_id=company_id, date=date, revenue=revenue, profit=profit, sales_count=count)
+            for (company_id, date), (revenue, profit, count) in daily_profit.items()
+        ], batch_size=1000)
+
+        ProductSalesTotal.objects.bulk_create([
+            ProductSalesTotal(company_id=company_id, product_id=product_id,
+                              units_sold=units, revenue=revenue, profit=profit)
+            for (company_id, product_id), (units, revenue, profit) in product_totals.items()
+        ], batch_size=1000)
+
+        ProductDailySales.objects.bulk_create([
+            ProductDailySales(company_id=company_id, product_id=product_id, date=date,
+                              units_sold=units, revenue=revenue, profit=profit)
+            for (company_id, product_id, date), (units, revenue, profit) in product_daily.items()
+        ], batch_size=1000)
+
+    if company_ids is None:
+        company_ids = Company.objects.values_list('id', flat=True)
+
+    invalidate_analytics(*company_ids)
+
+    return {
+        'daily profit': len(daily_profit),
+        'product totals': len(product_totals),
+        'product daily sales': len(product_daily),
+    }
+
+
+def _differences(table, stored, live):
+    return [
+        (table, key, stored.get(key), live.get(key))
+        for key in sorted(live.keys() | stored.keys())
+        if stored.get(key) != live.get(key)
+    ]
+
+
+def find_mismatches(company_ids=None):
+    """Rows where rollup tables differ from sale lines: [(table, key, stored, live)]"""
+
+    return (
+        _differences('daily profit', stored_daily_profit(company_ids), live_daily_profit(company_ids))
+        + _differences('product totals', stored_product_sales(company_ids), live_product_sales(company_ids))
+        + _differences('product daily sales',
+                       stored_product_sales(company_ids, by_date=True),
+                       live_product_sales(company_ids, by_date=True))
+    )
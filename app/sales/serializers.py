@@ -5,22 +5,19 @@ from decimal import Decimal
 from datetime import date
 
 from .models import Sale, ProductSale
-from products.models import Product
+from .rollup import record_sale
+from products.serializers import CompanyProductListSerializer
+from core.conditional import bump_versions
+from core.tenant import get_tenant
 from utils import calculate_price_at_sale
 
+
 class ProductSaleSerializer(serializers.Serializer):
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    product = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
 
-    def validate_product(self, product):
-        user = self.context['request'].user
-
-        if product.storage.company != user.company:
-            raise serializers.ValidationError(
-                'This product belongs to another company'
-            )
-
-        return product
+    class Meta:
+        list_serializer_class = CompanyProductListSerializer
 
 
 class SaleSerializer(serializers.ModelSerializer):
@@ -40,9 +37,7 @@ class SaleSerializer(serializers.ModelSerializer):
             self.fields['product_sales'].required = False
 
     def validate_company(self, company):
-        user = self.context['request'].user
-
-        if company != user.company:
+        if company.id != get_tenant(self.context['request']).company_id:
             raise serializers.ValidationError(
                 'You cannot create sale for another company'
             )
@@ -59,51 +54,51 @@ class SaleSerializer(serializers.ModelSerializer):
 
 
     def get_products_info(self, obj):
-        """Get information about products in the supply"""
+        """Get information about products in the sale"""
+
+        sales_items = obj.sales_items.all()
+
+        # Views prefetch lines, otherwise (after create/edit) load them in one query
+        if 'sales_items' not in getattr(obj, '_prefetched_objects_cache', {}):
+            sales_items = sales_items.select_related('product')
 
         return [
             {
-                'product': sp.product.id,
+                'product': sp.product_id,
                 'title': sp.product.title,
                 'quantity': sp.quantity,
                 'price_at_sale': sp.price_at_sale
             }
-            for sp in obj.sales_items.all()
+            for sp in sales_items
         ]
 
     def create(self, validated_data):
         product_data = validated_data.pop('product_sales')
-        user = self.context['request'].user
-
-        errors = {}
+        company_id = get_tenant(self.context['request']).company_id
 
+        quantities = {}
         for p in product_data:
-            product = p['product']
-
-            if product.quantity < p['quantity']:
-                errors[f'quantity: Not enough {product.title}'] = product.quantity
-
-        if errors:
-            raise serializers.ValidationError(errors)
+            quantities[p['product'].id] = quantities.get(p['product'].id, 0) + p['quantity']
 
         with transaction.atomic():
             sale = Sale.objects.create(
-                company=user.company,
+                company_id=company_id,
                 **validated_data
             )
 
-            for p in product_data:
-
-                price_at_sale = calculate_price_at_sale(p['product'].sale_price, sale.discount)
-
-                ProductSale.objects.create(
+            ProductSale.objects.bulk_create([
+                ProductSale(
                     sale=sale,
                     product=p['product'],
                     quantity=p['quantity'],
-                    price_at_sale=price_at_sale
+                    price_at_sale=calculate_price_at_sale(p['product'].sale_price, sale.discount),
+                    purchase_price_at_sale=p['product'].purchase_price
                 )
+                for p in product_data
+            ])
 
-            sale.apply()
+            sale.apply(quantities)
+            bump_versions('sales', 'products', company_id=company_id)
 
         return sale
 
@@ -111,9 +106,6 @@ class SaleSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Update product quantity and SupplyProduct model"""
 
-        instance.buyer_name = validated_data.get('buyer_name', instance.buyer_name)
-        instance.sale_date = validated_data.get('sale_date', instance.sale_date)
-
         if 'discount' in validated_data:
             raise serializers.ValidationError(
                 'Cannot change discount for an existing sale. Delete sale and create a new one.'
@@ -124,10 +116,39 @@ class SaleSerializer(serializers.ModelSerializer):
                 'Cannot change product\'s details (quantity, price, etc.) in existing sale. Delete sale and create a new one.'
             )
 
-        instance.save()
+        sale_date = validated_data.get('sale_date', instance.sale_date)
+
+        with transaction.atomic():
+            date_changed = sale_date != instance.sale_date
+
+            if date_changed:
+                record_sale(instance, sign=-1)
+
+            instance.buyer_name = validated_data.get('buyer_name', instance.buyer_name)
+            instance.sale_date = sale_date
+            instance.save()
+
+            if date_changed:
+                record_sale(instance)
+
+            bump_versions('sales', company_id=instance.company_id)
+
         return instance
 
 
+class SaleBatchItemSerializer(SaleSerializer):
+    """
+    Sale of a POS batch upload, identified by client's key. Lines are plain
+    ProductSaleSerializer rows, products are checked for the whole batch at once
+    """
+
+    product_sales = serializers.ListSerializer(child=ProductSaleSerializer(), allow_empty=False)
+    client_key = serializers.CharField(max_length=64)
+
+    class Meta(SaleSerializer.Meta):
+        fields = ['client_key', 'buyer_name', 'sale_date', 'discount', 'product_sales']
+
+
 class TopProductSalesSerializer(serializers.Serializer):
     product__id = serializers.IntegerField()
     product__title = serializers.CharField()
@@ -136,8 +157,9 @@ class TopProductSalesSerializer(serializers.Serializer):
 class TopProductProfitSerializer(serializers.Serializer):
     product__id = serializers.IntegerField()
     product__title = serializers.CharField()
-    total_profit = serializers.DecimalField(max_digits=10, decimal_places=2)
+    total_profit = serializers.DecimalField(max_digits=14, decimal_places=2)
 
 class ProfitAnalyticsSerializer(serializers.Serializer):
-    sale__sale_date = serializers.DateField()
-    total_profit = serializers.DecimalField(max_digits=12, decimal_places=2)
\ No newline at end of file
+    sale__sale_date = serializers.DateField(source='date')
+    total_profit = serializers.DecimalField(source='profit', max_digits=14, decimal_places=2)
+    total_revenue = serializers.DecimalField(source='revenue', max_digits=14, decimal_places=2)
\ No newline at end of file
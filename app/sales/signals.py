@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_analytics
+from .rollup import recount_sales, remove_product_sales
+
+
+@receiver(post_save, sender='products.Product')
+def invalidate_edited_product_analytics(sender, instance, created, **kwargs):
+    """Cached top products show titles, a renamed or repriced product must not be served from the cache"""
+
+    if not created:
+        invalidate_analytics(instance.storage.company_id)
+
+
+@receiver(pre_delete, sender='products.Product')
+def remove_deleted_product_sales(sender, instance, **kwargs):
+    """Sale lines of a deleted product (also through its storage) are cascade-deleted, take them out of analytics"""
+
+    instance._sales_days = remove_product_sales(instance)
+
+
+@receiver(post_delete, sender='products.Product')
+def recount_deleted_product_sales(sender, instance, **kwargs):
+    """Sales left without lines stop counting, known only after all cascaded lines are deleted"""
+
+    recount_sales(getattr(instance, '_sales_days', []))
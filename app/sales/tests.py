@@ -1,10 +1,28 @@
 import pytest
+import csv
+import json
+import tracemalloc
+from datetime import date, timedelta
+from io import StringIO
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
 
 from authenticate.models import User
 from companies.models import Company
+from core.pagination import KeysetPagination
 from products.models import Product
-from .models import Sale, ProductSale
+from products.stock import reserve_stock
+from storage.models import Storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from .models import Sale, ProductSale, DailyProfit, ProductSalesTotal, ProductDailySales
+from .cache import analytics_cache_stats
+from .rollup import find_mismatches
+from .views import SaleBatchCreateView
+from utils import calculate_price_at_sale
 
 #Create POST
 
@@ -160,6 +178,271 @@ def test_create_sale_excess_quantity_error(api_client, owner_with_supply, test_p
     assert 'quantity' in str(response.data)
 
 
+@pytest.mark.django_db
+def test_create_sale_reports_all_short_products(api_client, owner_with_supply, test_product_owner):
+    """Error: every product without enough stock is reported, stock stays untouched"""
+
+    api_client.force_authenticate(user=owner_with_supply)
+    other_product = Product.objects.create(
+        title='Other Product',
+        purchase_price=10,
+        sale_price=15,
+        quantity=1,
+        storage=test_product_owner.storage
+    )
+
+    url = reverse('sale-create')
+    data = {
+        'buyer_name': 'Test Buyer',
+        'sale_date': '2026-03-01',
+        'product_sales': [
+            {'product': test_product_owner.id, 'quantity': 7},
+            {'product': other_product.id, 'quantity': 2}
+        ]
+    }
+
+    response = api_client.post(url, data, format='json')
+
+    assert response.status_code == 400
+    assert 'quantity: Not enough Test Product' in response.data
+    assert 'quantity: Not enough Other Product' in response.data
+
+    test_product_owner.refresh_from_db()
+    other_product.refresh_from_db()
+    assert test_product_owner.quantity == 5
+    assert other_product.quantity == 1
+    assert Sale.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_create_sale_many_lines_success(api_client, owner_with_storage):
+    """All lines of a large sale are saved with discounted price"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    storage = owner_with_storage.company.storage
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=100 + i, quantity=10, storage=storage)
+        for i in range(50)
+    ])
+
+    url = reverse('sale-create')
+    data = {
+        'buyer_name': 'Test Buyer',
+        'sale_date': '2026-03-01',
+        'discount': 10,
+        'product_sales': [
+            {'product': p.id, 'quantity': 3} for p in products
+        ]
+    }
+
+    response = api_client.post(url, data, format='json')
+
+    assert response.status_code == 201
+    assert len(response.data['products_info']) == 50
+
+    sale = Sale.objects.get()
+    for line in sale.sales_items.select_related('product'):
+        assert line.price_at_sale == calculate_price_at_sale(line.product.sale_price, sale.discount)
+
+    assert set(Product.objects.values_list('quantity', flat=True)) == {7}
+
+
+@pytest.mark.django_db
+def test_create_sale_reports_unknown_and_foreign_products(api_client, owner_with_storage, employee_with_product):
+    """Error: unknown and foreign products are reported together, validation takes one query for all lines"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=20, quantity=10,
+                storage=owner_with_storage.company.storage)
+        for i in range(300)
+    ])
+    foreign_product = employee_with_product.company.storage.products.first()
+
+    url = reverse('sale-create')
+
+    def post(lines):
+        data = {
+            'buyer_name': 'Test Buyer',
+            'sale_date': '2026-03-01',
+            'product_sales': [{'product': p.id, 'quantity': 1} for p in lines]
+                             + [{'product': foreign_product.id, 'quantity': 1}, {'product': 999999, 'quantity': 1}]
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(url, data, format='json')
+
+        return response, len(queries)
+
+    small, small_queries = post(products[:3])
+    large, large_queries = post(products)
+
+    assert large.status_code == 400
+    assert str(foreign_product.id) in large.data['product_sales']['product'][0]
+    assert '999999' in large.data['product_sales']['product'][0]
+    assert large_queries == small_queries
+    assert not Sale.objects.exists()
+
+
+#Batch create POST
+
+def make_batch(products, count, quantity=1, prefix='pos'):
+    return [
+        {
+            'client_key': f'{prefix}-{i}',
+            'buyer_name': f'Buyer {i}',
+            'sale_date': '2026-03-01',
+            'product_sales': [{'product': p.id, 'quantity': quantity} for p in products]
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_batch_sales_success(api_client, owner_with_storage):
+    """POS batch creates sales, decrements stock by net quantity and updates analytics"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    storage = owner_with_storage.company.storage
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=20, quantity=100, storage=storage)
+        for i in range(3)
+    ])
+
+    data = make_batch(products, 20, quantity=2)
+    data[0]['discount'] = 10
+    response = api_client.post(reverse('sales-batch'), data, format='json')
+
+    assert response.status_code == 200
+    results = response.data['results']
+    assert [r['status'] for r in results] == ['created'] * 20
+    assert results[3]['client_key'] == 'pos-3'
+
+    assert Sale.objects.filter(company=owner_with_storage.company).count() == 20
+    assert ProductSale.objects.count() == 60
+    assert set(Product.objects.values_list('quantity', flat=True)) == {60}
+    assert Sale.objects.get(client_key='pos-0').sales_items.first().price_at_sale == 18
+
+    daily = DailyProfit.objects.get(company=owner_with_storage.company)
+    assert daily.sales_count == 20
+    assert find_mismatches() == []
+
+
+@pytest.mark.django_db
+def test_batch_sales_idempotent(api_client, owner_with_storage):
+    """Re-uploaded batch reports duplicates and does not change stock again"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    product = Product.objects.create(title='Pen', purchase_price=1, sale_price=2, quantity=50,
+                                     storage=owner_with_storage.company.storage)
+
+    url = reverse('sales-batch')
+    first = api_client.post(url, make_batch([product], 5), format='json').data['results']
+    again = api_client.post(url, make_batch([product], 7), format='json').data['results']
+
+    assert [r['status'] for r in again] == ['duplicate'] * 5 + ['created'] * 2
+    assert [r['id'] for r in again[:5]] == [r['id'] for r in first]
+
+    product.refresh_from_db()
+    assert product.quantity == 43
+    assert DailyProfit.objects.get().sales_count == 7
+
+
+@pytest.mark.django_db
+def test_batch_sales_replay_keeps_caches(api_client, owner_with_storage, shared_cache):
+    """Batch of duplicates only does not change ETags or drop analytics cache"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    product = Product.objects.create(title='Pen', purchase_price=1, sale_price=2, quantity=50,
+                                     storage=owner_with_storage.company.storage)
+
+    url = reverse('sales-batch')
+    batch = make_batch([product], 3)
+    api_client.post(url, batch, format='json')
+
+    etag = api_client.get(reverse('sales-list'))['ETag']
+    api_client.get(reverse('top5-sales'))
+
+    results = api_client.post(url, batch, format='json').data['results']
+    assert [r['status'] for r in results] == ['duplicate'] * 3
+
+    assert api_client.get(reverse('sales-list'), HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert api_client.get(reverse('top5-sales'))['X-Cache'] == 'HIT'
+
+
+@pytest.mark.django_db
+def test_batch_sales_partial_failure(api_client, owner_with_storage, foreign_company_employee):
+    """Error: invalid sales are reported one by one, the rest of the batch is created"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    product = Product.objects.create(title='Pen', purchase_price=1, sale_price=2, quantity=5,
+                                     storage=owner_with_storage.company.storage)
+    foreign_storage = Storage.objects.create(address='Foreign', company=foreign_company_employee.company)
+    foreign_product = Product.objects.create(title='Foreign', purchase_price=1, sale_price=2, quantity=5,
+                                             storage=foreign_storage)
+
+    data = make_batch([product], 6, quantity=2)
+    data[1]['product_sales'] = [{'product': foreign_product.id, 'quantity': 1}]
+    data[2]['sale_date'] = (date.today() + timedelta(1)).isoformat()
+    data[3]['client_key'] = 'pos-0'
+    data.append('not a sale')
+
+    response = api_client.post(reverse('sales-batch'), data, format='json')
+    assert response.status_code == 200
+
+    results = response.data['results']
+    assert [r['status'] for r in results] == ['created', 'error', 'error', 'error',
+                                              'created', 'error', 'error']
+    assert 'product_sales' in results[1]['errors']
+    assert 'sale_date' in results[2]['errors']
+    assert 'client_key' in results[3]['errors']
+    assert results[5]['errors'] == {'quantity: Not enough Pen': 1}
+
+    product.refresh_from_db()
+    foreign_product.refresh_from_db()
+    assert product.quantity == 1
+    assert foreign_product.quantity == 5
+    assert find_mismatches() == []
+
+
+@pytest.mark.django_db
+def test_batch_sales_queries_independent_of_batch_size(api_client, owner_with_storage):
+    """Batch of 100 sales of the same day takes no more queries than a batch of 5"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=20, quantity=1000,
+                storage=owner_with_storage.company.storage)
+        for i in range(5)
+    ])
+
+    url = reverse('sales-batch')
+
+    with CaptureQueriesContext(connection) as small:
+        api_client.post(url, make_batch(products, 5, prefix='small'), format='json')
+
+    with CaptureQueriesContext(connection) as large:
+        api_client.post(url, make_batch(products, 100, prefix='large'), format='json')
+
+    assert Sale.objects.count() == 105
+    assert len(large) <= len(small)
+
+
+@pytest.mark.django_db
+def test_batch_sales_request_errors(api_client, owner_with_storage, monkeypatch):
+    """Error: unauthorized user, not a list or a batch that is too large"""
+
+    url = reverse('sales-batch')
+    assert api_client.post(url, [], format='json').status_code == 401
+
+    api_client.force_authenticate(user=owner_with_storage)
+    assert api_client.post(url, [], format='json').status_code == 400
+    assert api_client.post(url, {'client_key': 'pos-1'}, format='json').status_code == 400
+
+    monkeypatch.setattr(SaleBatchCreateView, 'max_batch_size', 2)
+    assert api_client.post(url, [{}] * 3, format='json').status_code == 400
+
+
 #View all sales GET
 
 @pytest.mark.django_db
@@ -198,6 +481,181 @@ def test_sales_list_unauthorized_error(api_client, owner_with_sales):
     assert response.status_code == 401
 
 
+@pytest.mark.django_db
+def test_list_sales_queries_independent_of_basket_size(api_client, owner_with_storage):
+    """Sales list page costs the same number of queries for any basket size"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    storage = owner_with_storage.company.storage
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=15, quantity=100, storage=storage)
+        for i in range(10)
+    ])
+    sales = Sale.objects.bulk_create([
+        Sale(company=owner_with_storage.company, buyer_name=f'Buyer {i}', sale_date=date.today())
+        for i in range(10)
+    ])
+
+    def add_lines(basket):
+        ProductSale.objects.bulk_create([
+            ProductSale(sale=sale, product=p, quantity=1, price_at_sale=p.sale_price,
+                        purchase_price_at_sale=p.purchase_price)
+            for sale in sales
+            for p in basket
+        ])
+
+    url = reverse('sales-list')
+
+    add_lines(products[:1])
+    with CaptureQueriesContext(connection) as small_basket:
+        response = api_client.get(url)
+    assert response.status_code == 200
+    assert len(response.data['results'][0]['products_info']) == 1
+
+    add_lines(products[1:])
+    with CaptureQueriesContext(connection) as large_basket:
+        response = api_client.get(url)
+    assert response.status_code == 200
+    assert len(response.data['results'][0]['products_info']) == 10
+    assert response.data['results'][0]['products_info'][0]['title'] == 'Product 0'
+
+    assert len(large_basket) == len(small_basket)
+
+
+@pytest.mark.django_db
+def test_list_sales_cursor_pagination(api_client, owner_with_storage):
+    """Cursor mode walks sales by (sale_date, id) without skipping or repeating rows on inserts"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    company = owner_with_storage.company
+    today = date.today()
+
+    Sale.objects.bulk_create([
+        Sale(company=company, buyer_name=f'Buyer {i}', sale_date=today - timedelta(days=i % 3))
+        for i in range(10)
+    ])
+    expected = list(Sale.objects.order_by('sale_date', 'id').values_list('id', flat=True))
+
+    response = api_client.get(reverse('sales-list'), {'pagination': 'cursor', 'page_size': 3})
+    assert response.status_code == 200
+    assert 'count' not in response.data
+    assert response.data['previous'] is None
+
+    seen = [sale['id'] for sale in response.data['results']]
+    pages = [response.data]
+
+    # Rows inserted before the cursor position do not shift the following pages
+    Sale.objects.create(company=company, buyer_name='Late Buyer', sale_date=today - timedelta(days=5))
+
+    while response.data['next']:
+        response = api_client.get(response.data['next'])
+        assert response.status_code == 200
+        seen += [sale['id'] for sale in response.data['results']]
+        pages.append(response.data)
+
+    assert seen == expected
+
+    response = api_client.get(pages[2]['previous'])
+    assert [sale['id'] for sale in response.data['results']] == [sale['id'] for sale in pages[1]['results']]
+
+
+@pytest.mark.django_db
+def test_list_sales_invalid_cursor_error(api_client, owner_with_sales):
+    """Error: malformed cursor returns 404"""
+
+    api_client.force_authenticate(user=owner_with_sales)
+
+    response = api_client.get(reverse('sales-list'), {'cursor': 'not-a-cursor'})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_list_sales_wrong_typed_cursor_error(api_client, owner_with_sales):
+    """Error: cursor with values that do not fit the ordering fields returns 404"""
+
+    api_client.force_authenticate(user=owner_with_sales)
+
+    for values in (['not-a-date', 1], ['2026-03-01', 'abc'], ['2026-03-01']):
+        cursor = KeysetPagination().encode_cursor(values, reverse=False)
+        response = api_client.get(reverse('sales-list'), {'cursor': cursor})
+        assert response.status_code == 404
+
+
+#Export sales GET
+
+@pytest.mark.django_db
+def test_export_sales_ndjson_and_csv(api_client, owner_with_several_sales):
+    """Sales export streams every sale with its lines, filtered by dates"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+    url = reverse('sales-export')
+
+    response = api_client.get(url, {'output': 'ndjson', 'start_date': '2026-07-04', 'end_date': '2026-07-05'})
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-ndjson'
+
+    sales = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    assert [sale['sale_date'] for sale in sales] == ['2026-07-04', '2026-07-05']
+    assert len(sales[0]['lines']) == 7
+    assert sales[0]['lines'][0]['title'] == 'Product 1'
+
+    response = api_client.get(url)
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/csv'
+    rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+    assert rows[0][:2] == ['sale_id', 'sale_date']
+    assert len(rows) == 1 + 6 * 7
+
+
+@pytest.mark.django_db
+def test_export_sales_errors(api_client, owner_with_sales):
+    """Error: unknown output format or bad dates, unauthorized users"""
+
+    url = reverse('sales-export')
+    assert api_client.get(url).status_code == 401
+
+    api_client.force_authenticate(user=owner_with_sales)
+    assert api_client.get(url, {'output': 'xml'}).status_code == 400
+    assert api_client.get(url, {'start_date': '01.01.2026'}).status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries('INSERT INTO')
+def test_export_sales_constant_memory(api_client, owner_with_storage):
+    """Export of 100k sale lines stays within a fixed memory budget"""
+
+    api_client.force_authenticate(user=owner_with_storage)
+    company = owner_with_storage.company
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=15, storage=company.storage)
+        for i in range(5)
+    ])
+    sales = Sale.objects.bulk_create([
+        Sale(company=company, buyer_name=f'Buyer {i}', sale_date=date(2026, 1, 1) + timedelta(days=i % 300))
+        for i in range(20000)
+    ], batch_size=5000)
+    ProductSale.objects.bulk_create([
+        ProductSale(sale=sale, product=p, quantity=1, price_at_sale=15, purchase_price_at_sale=10)
+        for sale in sales
+        for p in products
+    ], batch_size=5000)
+    del sales
+
+    for output in ('ndjson', 'csv'):
+        response = api_client.get(reverse('sales-export'), {'output': output})
+        assert response.status_code == 200
+
+        lines = 0
+        tracemalloc.start()
+        for chunk in response.streaming_content:
+            lines += chunk.count(b'\n')
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert lines == (20000 if output == 'ndjson' else 100001)
+        assert peak < 10 * 1024 * 1024
+
+
 #View sale's details GET
 
 @pytest.mark.django_db
@@ -222,6 +680,19 @@ def test_view_sale_owner_success(api_client, owner_with_sales, test_product_owne
     test_product_owner.refresh_from_db()
     assert test_product_owner.quantity == 3
 
+@pytest.mark.django_db
+def test_view_sale_no_extra_queries(api_client, owner_with_sales, django_assert_num_queries):
+    """Permission checks compare ids, data versions, sale and its lines are the only queries"""
+
+    api_client.force_authenticate(user=owner_with_sales)
+    sale = Sale.objects.get()
+
+    with django_assert_num_queries(3):
+        response = api_client.get(reverse('sale-detail', args=[sale.id]))
+
+    assert response.status_code == 200
+
+
 @pytest.mark.django_db
 def test_view_sale_employee_success(api_client, employee_with_sales, test_product_employee):
     """Employee can view sale's details for their company"""
@@ -269,6 +740,66 @@ def test_view_sale_unauthorized_error(api_client, owner_with_sales):
 
     assert response.status_code == 401
 
+#Conditional GET
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries('"core_dataversion"')
+def test_sales_conditional_get(api_client, owner_with_sales, test_product_owner):
+    """Sales list and detail answer 304 until a sale or a product of the company changes"""
+
+    api_client.force_authenticate(user=owner_with_sales)
+    sale = Sale.objects.get()
+    list_url = reverse('sales-list')
+    detail_url = reverse('sale-detail', args=[sale.id])
+    params = {'start_date': '2026-01-01'}
+
+    etag = api_client.get(list_url, params)['ETag']
+    detail_etag = api_client.get(detail_url)['ETag']
+    assert api_client.get(list_url, params, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert api_client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code == 304
+
+    response = api_client.post(reverse('sale-create'), {
+        'buyer_name': 'Buyer', 'sale_date': '2026-03-02',
+        'product_sales': [{'product': test_product_owner.id, 'quantity': 1}]
+    }, format='json')
+    assert response.status_code == 201
+
+    response = api_client.get(list_url, params, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['count'] == 2
+
+    detail_etag = api_client.get(detail_url)['ETag']
+    api_client.patch(reverse('product-edit', args=[test_product_owner.id]), {'title': 'Renamed'}, format='json')
+
+    response = api_client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+    assert response.status_code == 200
+    assert response.data['products_info'][0]['title'] == 'Renamed'
+
+
+def last_update(queries, table):
+    return max(i for i, query in enumerate(queries) if query['sql'].startswith(f'UPDATE "{table}"'))
+
+
+@pytest.mark.django_db
+def test_sale_writes_bump_versions_last(api_client, owner_with_sales, test_product_owner):
+    """Sale create and delete move stock before data versions, locks are taken in one order"""
+
+    api_client.force_authenticate(user=owner_with_sales)
+
+    with CaptureQueriesContext(connection) as created:
+        response = api_client.post(reverse('sale-create'), {
+            'buyer_name': 'Buyer', 'sale_date': '2026-03-02',
+            'product_sales': [{'product': test_product_owner.id, 'quantity': 1}]
+        }, format='json')
+    assert response.status_code == 201
+
+    with CaptureQueriesContext(connection) as deleted:
+        assert api_client.delete(reverse('sale-delete', args=[response.data['id']])).status_code == 204
+
+    for queries in (created, deleted):
+        assert last_update(queries, 'products_product') < last_update(queries, 'core_dataversion')
+
+
 #Edit sale PUT
 
 @pytest.mark.django_db
@@ -608,6 +1139,482 @@ def test_profit_analytics_unauthorized_error(api_client):
     assert response.status_code == 401
 
 
+#Stock movement
+
+@pytest.mark.django_db
+def test_sale_apply_constant_queries(owner_with_storage, django_assert_num_queries):
+    """Applying and rolling back a sale costs the same number of queries for any basket size"""
+
+    storage = owner_with_storage.company.storage
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=15, quantity=100, storage=storage)
+        for i in range(30)
+    ])
+
+    sale = Sale.objects.create(
+        company=owner_with_storage.company,
+        buyer_name='Test Buyer',
+        sale_date='2026-03-01'
+    )
+    ProductSale.objects.bulk_create([
+        ProductSale(sale=sale, product=p, quantity=2,
+                    price_at_sale=calculate_price_at_sale(p.sale_price, sale.discount),
+                    purchase_price_at_sale=p.purchase_price)
+        for p in products
+    ])
+
+    with django_assert_num_queries(16):
+        sale.apply()
+
+    assert set(Product.objects.values_list('quantity', flat=True)) == {98}
+
+    with django_assert_num_queries(11):
+        sale.rollback()
+
+    assert set(Product.objects.values_list('quantity', flat=True)) == {100}
+
+
+@pytest.mark.django_db
+def test_sale_apply_groups_lines_by_product(owner_with_sales, test_product_owner):
+    """Several lines of the same product are applied as one net change"""
+
+    sale = owner_with_sales.company.sales.first()
+    ProductSale.objects.create(
+        sale=sale,
+        product=test_product_owner,
+        quantity=1,
+        price_at_sale=test_product_owner.sale_price
+    )
+
+    sale.rollback()
+    test_product_owner.refresh_from_db()
+    assert test_product_owner.quantity == 6
+
+    sale.apply()
+    test_product_owner.refresh_from_db()
+    assert test_product_owner.quantity == 3
+
+
+@pytest.mark.django_db
+def test_sale_apply_short_stock_error(owner_with_sales, test_product_owner):
+    """Error: sale is not applied when a product is short or was deleted, stock is untouched"""
+
+    sale = owner_with_sales.company.sales.first()
+
+    with pytest.raises(ValidationError):
+        sale.apply({test_product_owner.id: test_product_owner.quantity + 1})
+
+    with pytest.raises(ValidationError) as error:
+        reserve_stock({test_product_owner.id: 1, test_product_owner.id + 100: 1})
+
+    assert str(test_product_owner.id + 100) in str(error.value.detail['product'])
+    assert Product.objects.get(id=test_product_owner.id).quantity == test_product_owner.quantity
+
+
+#Concurrent sales
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_sales_never_oversell(owner_with_storage):
+    """Parallel sales of one product never take stock below zero"""
+
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from django.db import connection, OperationalError
+    from rest_framework.test import APIClient
+
+    product = Product.objects.create(
+        title='Hot Product',
+        purchase_price=10,
+        sale_price=15,
+        quantity=50,
+        storage=owner_with_storage.company.storage
+    )
+
+    url = reverse('sale-create')
+    data = {
+        'buyer_name': 'Test Buyer',
+        'sale_date': '2026-03-01',
+        'product_sales': [
+            {'product': product.id, 'quantity': 1}
+        ]
+    }
+
+    def sell(_):
+        client = APIClient()
+        client.force_authenticate(user=owner_with_storage)
+        try:
+            while True:
+                try:
+                    return client.post(url, data, format='json').status_code
+                except OperationalError:
+                    # In-memory test database reports lock contention instead of waiting
+                    time.sleep(0.01)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(sell, range(200)))
+
+    product.refresh_from_db()
+
+    assert product.quantity == 0
+    assert ProductSale.objects.filter(product=product).count() == 50
+    assert statuses.count(201) <= 50
+    assert 400 in statuses
+
+
+#Daily profit rollup
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries('FROM "sales_dailyprofit"')
+def test_daily_profit_follows_sale_changes(api_client, owner_with_supply, test_product_owner):
+    """Daily totals are updated when a sale is created, moved to another date and deleted"""
+
+    api_client.force_authenticate(user=owner_with_supply)
+    company = owner_with_supply.company
+
+    data = {
+        'buyer_name': 'Test Buyer',
+        'sale_date': '2026-03-01',
+        'discount': 20,
+        'product_sales': [
+            {'product': test_product_owner.id, 'quantity': 2}
+        ]
+    }
+    response = api_client.post(reverse('sale-create'), data, format='json')
+    assert response.status_code == 201
+    sale_id = response.data['id']
+
+    day = DailyProfit.objects.get(company=company, date='2026-03-01')
+    assert day.revenue == 24
+    assert day.profit == 4
+    assert day.sales_count == 1
+
+    response = api_client.put(reverse('sale-edit', args=[sale_id]),
+                              {'buyer_name': 'Test Buyer', 'sale_date': '2026-03-02'}, format='json')
+    assert response.status_code == 200
+
+    assert DailyProfit.objects.get(company=company, date='2026-03-01').sales_count == 0
+    assert DailyProfit.objects.get(company=company, date='2026-03-02').profit == 4
+
+    response = api_client.delete(reverse('sale-delete', args=[sale_id]))
+    assert response.status_code == 204
+
+    assert not DailyProfit.objects.filter(company=company, sales_count__gt=0).exists()
+    assert find_mismatches() == []
+
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries('FROM "sales_productsale"')
+def test_profit_analytics_matches_sale_lines(api_client, owner_with_several_sales):
+    """Profit analytics read from the rollup equal totals computed from sale lines"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+
+    response = api_client.get(reverse('profit-analytics'),
+                              {'start_date': '2026-07-01', 'end_date': '2026-07-31'})
+    assert response.status_code == 200
+
+    results = response.json()['results']
+    assert len(results) == 6
+
+    for row in results:
+        lines = ProductSale.objects.filter(sale__sale_date=row['sale__sale_date'])
+        expected = sum((line.price_at_sale - line.purchase_price_at_sale) * line.quantity for line in lines)
+        assert float(row['total_profit']) == pytest.approx(float(expected))
+
+
+@pytest.mark.django_db
+def test_profit_keeps_purchase_price_at_sale(api_client, owner_with_sales, test_product_owner):
+    """Changing product's purchase price does not rewrite profit of past sales"""
+
+    api_client.force_authenticate(user=owner_with_sales)
+
+    test_product_owner.purchase_price = 11
+    test_product_owner.save()
+
+    params = {'start_date': '2026-03-01', 'end_date': '2026-03-01'}
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(reverse('profit-analytics'), params)
+    assert response.status_code == 200
+    assert float(response.json()['results'][0]['total_profit']) == 4
+    assert not any('products_product' in query['sql'] for query in queries)
+
+    response = api_client.get(reverse('top5-profit'))
+    assert float(response.json()['results'][0]['total_profit']) == 4
+
+    call_command('rebuild_sales_analytics')
+    response = api_client.get(reverse('profit-analytics'), params)
+    assert float(response.json()['results'][0]['total_profit']) == 4
+
+
+@pytest.mark.django_db
+def test_rebuild_sales_analytics_command(owner_with_several_sales):
+    """Rebuild command restores a damaged rollup, check mode reports differences"""
+
+    DailyProfit.objects.filter(date='2026-07-03').update(profit=0)
+    DailyProfit.objects.filter(date='2026-07-04').delete()
+
+    with pytest.raises(CommandError):
+        call_command('rebuild_sales_analytics', '--check')
+
+    call_command('rebuild_sales_analytics')
+
+    assert DailyProfit.objects.count() == 6
+    assert find_mismatches() == []
+    call_command('rebuild_sales_analytics', '--check')
+
+
+
+@pytest.mark.django_db
+@pytest.mark.allow_duplicate_queries('"sales_dailyprofit"')
+def test_daily_profit_follows_product_delete(api_client, owner_with_several_sales):
+    """Lines cascade-deleted with a product or its storage are taken out of daily totals"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+    company = owner_with_several_sales.company
+    product = Product.objects.get(title='Product 1')
+    profit = DailyProfit.objects.get(company=company, date='2026-07-03').profit
+
+    response = api_client.delete(reverse('product-delete', args=[product.id]))
+    assert response.status_code == 204
+
+    day = DailyProfit.objects.get(company=company, date='2026-07-03')
+    assert day.profit < profit
+    assert day.sales_count == 1
+    assert find_mismatches() == []
+
+    response = api_client.delete(reverse('storage-delete', args=[company.storage.id]))
+    assert response.status_code == 204
+
+    assert not DailyProfit.objects.filter(company=company, sales_count__gt=0).exists()
+    assert find_mismatches() == []
+
+
+#Product sales counters
+
+@pytest.mark.django_db
+def test_product_sales_total_follows_sales(api_client, owner_with_supply, test_product_owner):
+    """Product counters are updated by sale creation and deletion"""
+
+    api_client.force_authenticate(user=owner_with_supply)
+
+    data = {
+        'buyer_name': 'Test Buyer',
+        'sale_date': '2026-03-01',
+        'discount': 20,
+        'product_sales': [
+            {'product': test_product_owner.id, 'quantity': 1},
+            {'product': test_product_owner.id, 'quantity': 2}
+        ]
+    }
+    response = api_client.post(reverse('sale-create'), data, format='json')
+    assert response.status_code == 201
+
+    total = ProductSalesTotal.objects.get(product=test_product_owner)
+    assert total.units_sold == 3
+    assert total.revenue == 36
+    assert total.profit == 6
+
+    response = api_client.delete(reverse('sale-delete', args=[response.data['id']]))
+    assert response.status_code == 204
+
+    total.refresh_from_db()
+    assert total.units_sold == 0
+    assert find_mismatches() == []
+
+
+
+@pytest.mark.django_db
+def test_product_sales_counters_follow_product_delete(api_client, owner_with_several_sales):
+    """Deleted product drops out of top products, counters of other products stay"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+    product = Product.objects.get(title='Product 7')
+    others = dict(ProductSalesTotal.objects.exclude(product=product).values_list('product_id', 'units_sold'))
+
+    response = api_client.delete(reverse('product-delete', args=[product.id]))
+    assert response.status_code == 204
+
+    assert not ProductSalesTotal.objects.filter(product_id=product.id).exists()
+    assert not ProductDailySales.objects.filter(product_id=product.id).exists()
+    assert dict(ProductSalesTotal.objects.values_list('product_id', 'units_sold')) == others
+
+    response = api_client.get(reverse('top5-sales'), {'limit': 3})
+    assert [row['product__title'] for row in response.json()['results']] == ['Product 6', 'Product 5', 'Product 4']
+    assert find_mismatches() == []
+
+@pytest.mark.django_db
+def test_top_products_limit_and_dates(api_client, owner_with_several_sales):
+    """Top products support ?limit= and a date range"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+
+    response = api_client.get(reverse('top5-sales'), {'limit': 3})
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert [row['product__title'] for row in results] == ['Product 7', 'Product 6', 'Product 5']
+    assert results[0]['total_sales'] == 17 * 6
+
+    response = api_client.get(reverse('top5-profit'),
+                              {'start_date': '2026-07-03', 'end_date': '2026-07-04', 'limit': 2})
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert len(results) == 2
+
+    lines = ProductSale.objects.filter(product__title=results[0]['product__title'],
+                                       sale__sale_date__range=['2026-07-03', '2026-07-04'])
+    expected = sum((line.price_at_sale - line.purchase_price_at_sale) * line.quantity for line in lines)
+    assert float(results[0]['total_profit']) == pytest.approx(float(expected))
+
+    response = api_client.get(reverse('top5-sales'), {'start_date': '2026-08-01', 'end_date': '2026-08-02'})
+    assert response.json()['count'] == 0
+
+
+@pytest.mark.django_db
+def test_top_products_invalid_limit_error(api_client, owner_with_several_sales):
+    """Error: limit should be a positive number within bounds"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+
+    for limit in ['abc', 0, 1000]:
+        response = api_client.get(reverse('top5-sales'), {'limit': limit})
+        assert response.status_code == 400
+
+
+#Analytics cache
+
+@pytest.mark.django_db
+def test_analytics_cache_hit(api_client, owner_with_several_sales, django_assert_num_queries, shared_cache):
+    """Repeated analytics request is served from cache without queries, default and explicit dates share it"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+    url = reverse('profit-analytics')
+
+    first = api_client.get(url)
+    assert first['X-Cache'] == 'MISS'
+
+    default_range = {'start_date': (date.today() - timedelta(90)).isoformat(), 'end_date': date.today().isoformat()}
+
+    with django_assert_num_queries(0):
+        second = api_client.get(url, default_range)
+
+    assert second['X-Cache'] == 'HIT'
+    assert second.json() == first.json()
+
+    assert api_client.get(reverse('top5-sales'), {'limit': 3})['X-Cache'] == 'MISS'
+    assert api_client.get(reverse('top5-sales'), {'limit': 3})['X-Cache'] == 'HIT'
+    assert api_client.get(reverse('top5-sales'), {'limit': 4})['X-Cache'] == 'MISS'
+    assert api_client.get(reverse('top5-profit'), {'limit': 3})['X-Cache'] == 'MISS'
+
+    assert analytics_cache_stats() == {'hits': 2, 'misses': 4}
+
+    out = StringIO()
+    call_command('analytics_cache_stats', '--reset', stdout=out)
+    assert 'hits: 2, misses: 4, hit ratio: 33.3%' in out.getvalue()
+    assert analytics_cache_stats() == {'hits': 0, 'misses': 0}
+
+
+@pytest.mark.django_db
+def test_analytics_cache_off_per_process(api_client, owner_with_several_sales):
+    """Per-process cache does not cache analytics, invalidations would not reach other workers"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+
+    for _ in range(2):
+        response = api_client.get(reverse('top5-sales'))
+        assert response.status_code == 200
+        assert 'X-Cache' not in response
+
+    assert analytics_cache_stats() == {'hits': 0, 'misses': 0}
+
+    with pytest.raises(CommandError, match='shared between worker processes'):
+        call_command('analytics_cache_stats', stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_analytics_cache_invalidated_by_sales(api_client, owner_with_several_sales, employee_with_product, shared_cache):
+    """Cache is dropped when a sale of the company is created, moved to another date or deleted"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+    product = Product.objects.create(title='Fresh', purchase_price=1, sale_price=1000, quantity=10,
+                                     storage=owner_with_several_sales.company.storage)
+
+    url = reverse('top5-profit')
+    api_client.get(url)
+
+    foreign_client = APIClient()
+    foreign_client.force_authenticate(user=employee_with_product)
+    foreign_product = employee_with_product.company.storage.products.first()
+    foreign_client.post(reverse('sale-create'), {
+        'buyer_name': 'Foreign', 'sale_date': '2026-07-03',
+        'product_sales': [{'product': foreign_product.id, 'quantity': 1}]
+    }, format='json')
+    assert api_client.get(url)['X-Cache'] == 'HIT'
+
+    response = api_client.post(reverse('sale-create'), {
+        'buyer_name': 'Buyer', 'sale_date': '2026-07-03',
+        'product_sales': [{'product': product.id, 'quantity': 10}]
+    }, format='json')
+    sale_id = response.data['id']
+
+    response = api_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['results'][0]['product__title'] == 'Fresh'
+
+    edit_url = reverse('sale-edit', args=[sale_id])
+    api_client.patch(edit_url, {'buyer_name': 'Renamed'}, format='json')
+    assert api_client.get(url)['X-Cache'] == 'HIT'
+
+    api_client.patch(edit_url, {'sale_date': '2026-07-04'}, format='json')
+    assert api_client.get(url)['X-Cache'] == 'MISS'
+
+    api_client.delete(reverse('sale-delete', args=[sale_id]))
+    response = api_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['results'][0]['product__title'] != 'Fresh'
+
+
+@pytest.mark.django_db
+def test_analytics_cache_invalidated_by_products(api_client, owner_with_several_sales, shared_cache):
+    """Cache is dropped when a product is renamed or deleted, top products show fresh titles"""
+
+    api_client.force_authenticate(user=owner_with_several_sales)
+    product = Product.objects.get(title='Product 7')
+    url = reverse('top5-sales')
+
+    api_client.get(url)
+    assert api_client.get(url)['X-Cache'] == 'HIT'
+
+    response = api_client.patch(reverse('product-edit', args=[product.id]), {'title': 'Renamed'}, format='json')
+    assert response.status_code == 200
+
+    response = api_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['results'][0]['product__title'] == 'Renamed'
+
+    api_client.delete(reverse('product-delete', args=[product.id]))
+
+    response = api_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['results'][0]['product__title'] == 'Product 6'
+
+#Query plans
+
+@pytest.mark.django_db
+def test_sales_queries_use_indexes(owner_with_sales, assert_no_full_scan):
+    """Tenant-scoped sale queries are index searches"""
 
+    company = owner_with_sales.company
 
+    plan = assert_no_full_scan(
+        Sale.objects.filter(company=company, sale_date__range=['2026-01-01', '2026-03-31']).order_by('sale_date'),
+        'sales_sale'
+    )
+    assert 'sale_company_date_idx' in plan
 
+    assert_no_full_scan(
+        ProductSale.objects.filter(sale__company=company, sale__sale_date__range=['2026-01-01', '2026-03-31']),
+        'sales_sale', 'sales_productsale'
+    )
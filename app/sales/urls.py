@@ -1,12 +1,14 @@
 from django.urls import path
 from drf_spectacular.utils import extend_schema_view, extend_schema
-from .views import (SaleCreateView, SaleEditView, SaleDeleteView, SaleDetailView, SalesListView,
-                    TopProductsSalesView, TopProductsProfitView, ProfitAnalyticsView)
+from .views import (SaleCreateView, SaleBatchCreateView, SaleEditView, SaleDeleteView, SaleDetailView,
+                    SalesListView, SalesExportView, TopProductsSalesView, TopProductsProfitView, ProfitAnalyticsView)
 
 
 urlpatterns = [
     path('create/', SaleCreateView.as_view(), name='sale-create'),
+    path('batch/', SaleBatchCreateView.as_view(), name='sales-batch'),
     path('list/', SalesListView.as_view(), name='sales-list'),
+    path('export/', SalesExportView.as_view(), name='sales-export'),
     path('<int:pk>/', SaleDetailView.as_view(), name='sale-detail'),
     path('<int:pk>/edit/', SaleEditView.as_view(), name='sale-edit'),
     path('<int:pk>/delete/', SaleDeleteView.as_view(), name='sale-delete'),
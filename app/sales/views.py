@@ -1,13 +1,22 @@
 from django.contrib.admindocs.utils import parse_rst
 from django.db.models import Sum, F
 from django.db.models.functions import TruncDate
+from django.http import StreamingHttpResponse
 from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from datetime import date, timedelta, datetime
 
 from .permissions import SalePermissions
-from .serializers import SaleSerializer, TopProductSalesSerializer, TopProductProfitSerializer, ProfitAnalyticsSerializer
-from .models import Sale, ProductSale
-from utils import parse_date
+from .serializers import (SaleSerializer, SaleBatchItemSerializer, TopProductSalesSerializer,
+                          TopProductProfitSerializer, ProfitAnalyticsSerializer)
+from .models import Sale, ProductSale, DailyProfit, ProductSalesTotal, ProductDailySales
+from .batch import ingest_sales
+from .cache import CachedAnalyticsMixin
+from .export import CSV_HEADER, iter_sale_rows, iter_sales
+from core.conditional import ConditionalGetMixin
+from core.tenant import get_tenant
+from utils import parse_date, parse_limit, products_info_prefetch, stream_csv, stream_ndjson
 
 
 class SaleCreateView(generics.CreateAPIView):
@@ -16,47 +25,124 @@ class SaleCreateView(generics.CreateAPIView):
     queryset = Sale.objects.all()
     permission_classes = [permissions.IsAuthenticated, SalePermissions]
 
-class SalesListView(generics.ListAPIView):
+class SaleBatchCreateView(generics.GenericAPIView):
+    """
+    Create many sales at once (POS batch upload). Every sale has a client_key,
+    sales uploaded before with the same key are not created again.
+    Returns a result per sale: created, duplicate or error
+    """
+
+    serializer_class = SaleBatchItemSerializer
+    permission_classes = [permissions.IsAuthenticated, SalePermissions]
+    max_batch_size = 1000
+
+    def post(self, request):
+        rows = request.data
+
+        if not isinstance(rows, list) or not rows:
+            raise ValidationError('Expected a non-empty list of sales')
+
+        if len(rows) > self.max_batch_size:
+            raise ValidationError(f'Batch cannot have more than {self.max_batch_size} sales')
+
+        results = [None] * len(rows)
+        sales, indexes = {}, {}
+
+        for i, row in enumerate(rows):
+            serializer = self.get_serializer(data=row)
+
+            if not serializer.is_valid():
+                results[i] = {'status': 'error', 'errors': serializer.errors}
+                continue
+
+            key = serializer.validated_data['client_key']
+
+            if key in sales:
+                results[i] = {'status': 'error', 'errors': {'client_key': ['Duplicate client_key in the batch']}}
+                continue
+
+            sales[key] = serializer.validated_data
+            indexes[key] = i
+
+        if sales:
+            company_id = get_tenant(request).company_id
+
+            for key, result in ingest_sales(company_id, sales).items():
+                results[indexes[key]] = result
+
+        return Response({'results': [
+            {'client_key': row.get('client_key') if isinstance(row, dict) else None, **result}
+            for row, result in zip(rows, results)
+        ]})
+
+
+class SalesListView(ConditionalGetMixin, generics.ListAPIView):
     """View list of sales"""
 
     serializer_class = SaleSerializer
     permission_classes = [permissions.IsAuthenticated, SalePermissions]
+    version_models = ('sales', 'products')
+    keyset_ordering = ('sale_date', 'id')
 
     def get_queryset(self):
         queryset = Sale.objects.filter(
-            company=self.request.user.company
-        )
+            company_id=get_tenant(self.request).company_id
+        ).prefetch_related(products_info_prefetch('sales_items', ProductSale, 'sale_id', 'quantity', 'price_at_sale'))
+
+        start_date, end_date = get_date_range(self.request)
 
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
+        queryset = (queryset
+                    .filter(sale_date__range=[start_date, end_date])
+                    .order_by('sale_date', 'id'))
+
+        return queryset
+
+
+class SalesExportView(generics.GenericAPIView):
+    """Stream all sales with their lines as CSV (default) or NDJSON (?output=ndjson)"""
+
+    permission_classes = [permissions.IsAuthenticated, SalePermissions]
+    chunk_size = 2000
+
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+
+        if output not in ('ndjson', 'csv'):
+            raise ValidationError('output should be ndjson or csv')
+
+        queryset = Sale.objects.filter(company_id=get_tenant(request).company_id)
+
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
 
         if start_date:
-            start_date = parse_date(start_date, 'start_date')
-        else:
-            start_date = date.today() - timedelta(90)
+            queryset = queryset.filter(sale_date__gte=parse_date(start_date, 'start_date'))
 
         if end_date:
-            end_date = parse_date(end_date, 'end_date')
-        else:
-            end_date = date.today()
+            queryset = queryset.filter(sale_date__lte=parse_date(end_date, 'end_date'))
 
-        queryset = (queryset
-                    .filter(sale_date__range=[start_date, end_date])
-                    .order_by('sale_date'))
+        rows = iter_sale_rows(queryset, self.chunk_size)
 
-        return queryset
+        if output == 'csv':
+            response = StreamingHttpResponse(stream_csv(CSV_HEADER, rows), content_type='text/csv')
+        else:
+            response = StreamingHttpResponse(stream_ndjson(iter_sales(rows)), content_type='application/x-ndjson')
 
+        response['Content-Disposition'] = f'attachment; filename="sales.{output}"'
+        return response
 
-class SaleDetailView(generics.RetrieveAPIView):
+
+class SaleDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """View sale's detail"""
 
     serializer_class = SaleSerializer
     permission_classes = [permissions.IsAuthenticated, SalePermissions]
+    version_models = ('sales', 'products')
 
     def get_queryset(self):
         return Sale.objects.filter(
-            company=self.request.user.company
-        )
+            company_id=get_tenant(self.request).company_id
+        ).prefetch_related(products_info_prefetch('sales_items', ProductSale, 'sale_id', 'quantity', 'price_at_sale'))
 
 class SaleEditView(generics.UpdateAPIView):
     """Edit sale's detail"""
@@ -66,8 +152,8 @@ class SaleEditView(generics.UpdateAPIView):
 
     def get_queryset(self):
         return Sale.objects.filter(
-            company=self.request.user.company
-        )
+            company_id=get_tenant(self.request).company_id
+        ).prefetch_related(products_info_prefetch('sales_items', ProductSale, 'sale_id', 'quantity', 'price_at_sale'))
 
 class SaleDeleteView(generics.DestroyAPIView):
     """Delete sale"""
@@ -77,71 +163,107 @@ class SaleDeleteView(generics.DestroyAPIView):
 
     def get_queryset(self):
         return Sale.objects.filter(
-            company=self.request.user.company
+            company_id=get_tenant(self.request).company_id
+        )
+
+
+def get_date_range(request):
+    """Dates from ?start_date= and ?end_date=, last 90 days by default"""
+
+    start_date = request.query_params.get('start_date')
+    end_date = request.query_params.get('end_date')
+
+    if start_date:
+        start_date = parse_date(start_date, 'start_date')
+    else:
+        start_date = date.today() - timedelta(90)
+
+    if end_date:
+        end_date = parse_date(end_date, 'end_date')
+    else:
+        end_date = date.today()
+
+    return start_date, end_date
+
+
+def get_date_range_params(request):
+    start_date, end_date = get_date_range(request)
+    return {'start_date': start_date, 'end_date': end_date}
+
+
+def get_top_products_params(request):
+    """Limit and date range of top products, no dates means all-time totals"""
+
+    params = {'limit': parse_limit(request.query_params.get('limit'))}
+
+    if request.query_params.get('start_date') or request.query_params.get('end_date'):
+        params['start_date'], params['end_date'] = get_date_range(request)
+
+    return params
+
+
+def get_top_products(request, counter, alias):
+    """
+    Top products of the user's company by a counter (units_sold or profit).
+    Reads all-time running totals, or per-day counters when a date range is given
+    """
+
+    company_id = get_tenant(request).company_id
+    params = get_top_products_params(request)
+    limit = params['limit']
+
+    if 'start_date' not in params:
+        return (
+            ProductSalesTotal.objects
+            .filter(company_id=company_id, units_sold__gt=0)
+            .order_by(f'-{counter}')
+            .values('product__id', 'product__title', **{alias: F(counter)})[:limit]
         )
 
+    return (
+        ProductDailySales.objects
+        .filter(company_id=company_id, date__range=[params['start_date'], params['end_date']])
+        .values('product__id', 'product__title')
+        .annotate(units=Sum('units_sold'), **{alias: Sum(counter)})
+        .filter(units__gt=0)
+        .order_by(f'-{alias}')[:limit]
+    )
+
 
-class TopProductsSalesView(generics.ListAPIView):
-    """View list of top 5 products by n of Sales"""
+class TopProductsSalesView(CachedAnalyticsMixin, generics.ListAPIView):
+    """View list of top products by n of Sales, 5 by default (?limit=, ?start_date=, ?end_date=)"""
 
     serializer_class =  TopProductSalesSerializer
     permission_classes = [permissions.IsAuthenticated, SalePermissions]
+    cache_params = staticmethod(get_top_products_params)
 
     def get_queryset(self):
-        return (
-            ProductSale.objects
-            .filter(sale__company=self.request.user.company)
-            .values('product__id', 'product__title')
-            .annotate(total_sales=Sum('quantity'))
-            .order_by('-total_sales')[:5]
-        )
+        return get_top_products(self.request, 'units_sold', 'total_sales')
 
-class TopProductsProfitView(generics.ListAPIView):
-    """View list of top 5 products by profit"""
+class TopProductsProfitView(CachedAnalyticsMixin, generics.ListAPIView):
+    """View list of top products by profit, 5 by default (?limit=, ?start_date=, ?end_date=)"""
 
     serializer_class = TopProductProfitSerializer
     permission_classes = [permissions.IsAuthenticated, SalePermissions]
+    cache_params = staticmethod(get_top_products_params)
 
     def get_queryset(self):
-        return (
-            ProductSale.objects
-            .filter(sale__company=self.request.user.company)
-            .values('product__id', 'product__title')
-            .annotate(total_profit=Sum(
-                (F('price_at_sale') - F('product__purchase_price')) * F('quantity')
-            ))
-            .order_by('-total_profit')[:5]
-        )
+        return get_top_products(self.request, 'profit', 'total_profit')
 
 
-class ProfitAnalyticsView(generics.ListAPIView):
+class ProfitAnalyticsView(CachedAnalyticsMixin, generics.ListAPIView):
     """View analytics of profit for a specific time period"""
     serializer_class = ProfitAnalyticsSerializer
     permission_classes = [permissions.IsAuthenticated, SalePermissions]
+    cache_params = staticmethod(get_date_range_params)
 
     def get_queryset(self):
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-
-        queryset = ProductSale.objects.filter(sale__company=self.request.user.company)
-
-        if start_date:
-            start_date = parse_date(start_date, 'start_date')
-        else:
-            start_date = date.today() - timedelta(90)
-
-        if end_date:
-            end_date = parse_date(end_date, 'end_date')
-        else:
-            end_date = date.today()
-
-        queryset = queryset.filter(sale__sale_date__range=[start_date, end_date])
+        start_date, end_date = get_date_range(self.request)
 
         return (
-            queryset
-            .values('sale__sale_date')
-            .annotate(total_profit=Sum(
-                (F('price_at_sale') - F('product__purchase_price')) * F('quantity')
-            ))
-            .order_by('sale__sale_date')
-        )
\ No newline at end of file
+            DailyProfit.objects
+            .filter(company_id=get_tenant(self.request).company_id, sales_count__gt=0)
+            .filter(date__range=[start_date, end_date])
+            .values('date', 'revenue', 'profit')
+            .order_by('date')
+        )
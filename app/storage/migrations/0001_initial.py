@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('companies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Storage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=5000)),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='storage', to='companies.company')),
+            ],
+            options={
+                'verbose_name': 'Storage',
+                'verbose_name_plural': 'Storages',
+            },
+        ),
+    ]
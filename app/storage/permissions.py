@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from core.tenant import get_tenant
+
 
 class StoragePermission(permissions.BasePermission):
     """
@@ -8,17 +10,17 @@ class StoragePermission(permissions.BasePermission):
 
     def has_permission(self, request, view):
         if request.method == 'POST':
-            return request.user.is_authenticated and request.user.is_company_owner
+            return get_tenant(request).is_owner
         return True
 
     def has_object_permission(self, request, view, obj):
 
-        user = request.user
+        tenant = get_tenant(request)
 
-        if obj.company != user.company:
+        if obj.company_id != tenant.company_id:
             return False
 
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        return request.user.is_company_owner
\ No newline at end of file
+        return tenant.is_owner
@@ -1,6 +1,7 @@
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from .models import Storage
+from core.tenant import get_tenant
 
 class StorageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,15 +10,13 @@ class StorageSerializer(serializers.ModelSerializer):
         fields = ['id', 'address', 'company']
 
     def create(self, validated_data):
-        user = self.context['request'].user
+        tenant = get_tenant(self.context['request'])
 
-        if not user.is_company_owner:
+        if not tenant.is_owner:
             raise ValidationError('This user cannot access storage')
 
-        company = user.company
-
-        if hasattr(company, 'storage'):
+        if Storage.objects.filter(company_id=tenant.company_id).exists():
             raise ValidationError('Company already has a storage')
 
-        return Storage.objects.create(company=company, **validated_data)
+        return Storage.objects.create(company_id=tenant.company_id, **validated_data)
 
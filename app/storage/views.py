@@ -4,6 +4,7 @@ from .models import Storage
 from .serializers import StorageSerializer
 from .permissions import StoragePermission
 from companies.models import Company
+from core.tenant import get_tenant
 
 
 class StorageCreateView(generics.CreateAPIView):
@@ -22,7 +23,7 @@ class StorageDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         return Storage.objects.filter(
-            company=self.request.user.company
+            company_id=get_tenant(self.request).company_id
         )
 
 class StorageDeleteView(generics.DestroyAPIView):
@@ -33,7 +34,7 @@ class StorageDeleteView(generics.DestroyAPIView):
 
     def get_queryset(self):
         return Storage.objects.filter(
-            company=self.request.user.company
+            company_id=get_tenant(self.request).company_id
         )
 
 
@@ -45,5 +46,5 @@ class StorageEditView(generics.UpdateAPIView):
 
     def get_queryset(self):
         return Storage.objects.filter(
-            company=self.request.user.company
+            company_id=get_tenant(self.request).company_id
         )
\ No newline at end of file
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from .models import Supplier
+from core.tenant import get_tenant
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,7 +11,6 @@ class SupplierSerializer(serializers.ModelSerializer):
 
 
     def create(self, validated_data):
-        user = self.context['request'].user
-        company = user.company
+        company_id = get_tenant(self.context['request']).company_id
 
-        return Supplier.objects.create(company=company, **validated_data)
+        return Supplier.objects.create(company_id=company_id, **validated_data)
@@ -4,6 +4,7 @@ from .models import Supplier
 from .serializers import SupplierSerializer
 from .permissions import SupplierPermission
 from companies.models import Company
+from core.tenant import get_tenant
 
 class SupplierCreateView(generics.CreateAPIView):
     """Create new supplier"""
@@ -18,10 +19,11 @@ class SupplierListView(generics.ListAPIView):
 
     serializer_class = SupplierSerializer
     permission_classes = [permissions.IsAuthenticated, SupplierPermission]
+    keyset_ordering = ('id',)
 
     def get_queryset(self):
         return (Supplier.objects
-        .filter(company=self.request.user.company)
+        .filter(company_id=get_tenant(self.request).company_id)
         .order_by('id'))
 
 
@@ -33,7 +35,7 @@ class SupplierDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         return Supplier.objects.filter(
-            company=self.request.user.company
+            company_id=get_tenant(self.request).company_id
         )
 
 
@@ -45,7 +47,7 @@ class SupplierDeleteView(generics.DestroyAPIView):
 
     def get_queryset(self):
         return Supplier.objects.filter(
-            company=self.request.user.company
+            company_id=get_tenant(self.request).company_id
         )
 
 
@@ -57,5 +59,5 @@ class SupplierEditView(generics.UpdateAPIView):
 
     def get_queryset(self):
         return Supplier.objects.filter(
-            company=self.request.user.company
+            company_id=get_tenant(self.request).company_id
         )
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Supply, SupplyProduct
+from core.conditional import bump_versions
 
 
 class SupplyProductInline(admin.TabularInline):
@@ -14,3 +15,8 @@ class SupplyAdmin(admin.ModelAdmin):
 
     inlines = [SupplyProductInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # After the lines, like the API (see core.conditional.bump_versions)
+        bump_versions('supplies', 'products', company__suppliers=form.instance.supplier_id)
+
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0001_initial'),
+        ('suppliers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Supply',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delivery_date', models.DateField()),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplies', to='suppliers.supplier')),
+            ],
+            options={
+                'verbose_name': 'Supply',
+                'verbose_name_plural': 'Supplies',
+            },
+        ),
+        migrations.CreateModel(
+            name='SupplyProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supply_product_items', to='products.product')),
+                ('supply', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supply_items', to='supplies.supply')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='supply',
+            index=models.Index(fields=['supplier', 'delivery_date'], name='supply_supplier_date_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import ForeignKey
 
+from products.stock import collect_quantities, move_stock
+
 class Supply(models.Model):
     supplier = models.ForeignKey(
         'suppliers.Supplier',
@@ -14,20 +16,26 @@ class Supply(models.Model):
     class Meta:
         verbose_name = 'Supply'
         verbose_name_plural = 'Supplies'
+        indexes = [
+            # Supplier's supplies in delivery order without a sort
+            models.Index(fields=['supplier', 'delivery_date'], name='supply_supplier_date_idx'),
+        ]
 
     def apply(self):
-        for sp in self.supply_items.all():
-            sp.product.quantity += sp.quantity
-            sp.product.save()
+        """Add delivered quantities to stock"""
+
+        move_stock(collect_quantities(self.supply_items))
 
     def rollback(self):
-        for sp in self.supply_items.all():
-            sp.product.quantity -= sp.quantity
-            sp.product.save()
+        """Take delivered quantities out of stock"""
+
+        quantities = collect_quantities(self.supply_items)
+        move_stock({pk: -qty for pk, qty in quantities.items()})
 
     def delete(self, *args, **kwargs):
-        self.rollback()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            self.rollback()
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f'Supply #{self.id}'
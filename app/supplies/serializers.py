@@ -1,24 +1,21 @@
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
+from django.db import transaction
 from datetime import date
 
 from .models import Supply, SupplyProduct
-from products.models import Product
+from products.serializers import CompanyProductListSerializer
+from core.conditional import bump_versions
+from core.tenant import get_tenant
+from products.stock import collect_quantities, move_stock
 
-class SupplyProductSerializer(serializers.Serializer):
 
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+class SupplyProductSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
 
-    def validate_product(self, product):
-        user = self.context['request'].user
-
-        if product.storage.company != user.company:
-            raise serializers.ValidationError(
-                'This product belongs to another company'
-            )
-
-        return product
+    class Meta:
+        list_serializer_class = CompanyProductListSerializer
 
 
 class SupplySerializer(serializers.ModelSerializer):
@@ -31,9 +28,7 @@ class SupplySerializer(serializers.ModelSerializer):
         fields = ['id', 'supplier', 'delivery_date', 'products', 'products_info']
 
     def validate_supplier(self, supplier):
-        user = self.context['request'].user
-
-        if supplier.company != user.company:
+        if supplier.company_id != get_tenant(self.context['request']).company_id:
             raise serializers.ValidationError(
                 'You cannot create supply for another supplier'
             )
@@ -50,13 +45,20 @@ class SupplySerializer(serializers.ModelSerializer):
 
     def get_products_info(self, obj):
         """Get information about products in the supply"""
+
+        supply_items = obj.supply_items.all()
+
+        # Views prefetch lines, otherwise (after create/edit) load them in one query
+        if 'supply_items' not in getattr(obj, '_prefetched_objects_cache', {}):
+            supply_items = supply_items.select_related('product')
+
         return [
             {
-            'product': sp.product.id,
+            'product': sp.product_id,
             'title': sp.product.title,
             'quantity': sp.quantity
             }
-            for sp in obj.supply_items.all()
+            for sp in supply_items
         ]
 
     def create(self, validated_data):
@@ -64,43 +66,73 @@ class SupplySerializer(serializers.ModelSerializer):
 
         product_data = validated_data.pop('products')
 
-        supply = Supply.objects.create(**validated_data)
+        with transaction.atomic():
+            supply = Supply.objects.create(**validated_data)
 
-        for p in product_data:
-            SupplyProduct.objects.create(
-                supply=supply,
-                product=p['product'],
-                quantity=p['quantity']
-            )
+            SupplyProduct.objects.bulk_create([
+                SupplyProduct(
+                    supply=supply,
+                    product=p['product'],
+                    quantity=p['quantity']
+                )
+                for p in product_data
+            ])
 
-        supply.apply()
+            supply.apply()
+            bump_versions('supplies', 'products', company_id=supply.supplier.company_id)
 
         return supply
 
 
     def update(self, instance, validated_data):
-        """Update product quantity and SupplyProduct model"""
+        """
+        Update SupplyProduct items and product qty.
+        Only lines of products whose quantity changed are rewritten,
+        and stock receives the net difference per product
+        """
 
-        product_data = validated_data.pop('products')
-        instance.rollback()
+        product_data = validated_data.pop('products', None)
+
+        with transaction.atomic():
+            instance.supplier = validated_data.get('supplier', instance.supplier)
+            instance.delivery_date = validated_data.get('delivery_date', instance.delivery_date)
+            instance.save()
 
-        instance.supplier = validated_data.get('supplier', instance.supplier)
-        instance.delivery_date = validated_data.get('delivery_date', instance.delivery_date)
-        instance.save()
+            if product_data is not None:
+                self.update_lines(instance, product_data)
 
-        instance.supply_items.all().delete()
+            bump_versions('supplies', 'products', company_id=instance.supplier.company_id)
+
+        return instance
 
+    def update_lines(self, instance, product_data):
+        """Rewrite lines of products whose quantity changed, move stock by the difference"""
+
+        old_quantities = collect_quantities(instance.supply_items)
+
+        new_quantities = {}
         for p in product_data:
+            new_quantities[p['product'].id] = new_quantities.get(p['product'].id, 0) + p['quantity']
+
+        deltas = {
+            pk: new_quantities.get(pk, 0) - old_quantities.get(pk, 0)
+            for pk in old_quantities.keys() | new_quantities.keys()
+        }
+        changed = {pk for pk, delta in deltas.items() if delta}
 
-            SupplyProduct.objects.create(
+        if not changed:
+            return
+
+        instance.supply_items.filter(product_id__in=changed).delete()
+
+        SupplyProduct.objects.bulk_create([
+            SupplyProduct(
                 supply=instance,
                 product=p['product'],
                 quantity=p['quantity']
             )
+            for p in product_data
+            if p['product'].id in changed
+        ])
 
-        instance.apply()
-
-        return instance
-
-
-
+        move_stock(deltas)
@@ -1,10 +1,13 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from datetime import datetime
 
 from authenticate.models import User
 from companies.models import Company
 from suppliers.models import Supplier
+from products.models import Product
 from .models import Supply, SupplyProduct
 
 # Create POST
@@ -137,6 +140,44 @@ def test_create_supply_negative_quantity(api_client, owner_with_supplier, test_p
     assert 'quantity' in str(response.data)
 
 
+@pytest.mark.django_db
+def test_create_supply_reports_unknown_and_foreign_products(api_client, owner_with_supplier, test_storage_owner,
+                                                            employee_with_product):
+    """Error: unknown and foreign products are reported together, validation takes one query for all lines"""
+
+    api_client.force_authenticate(user=owner_with_supplier)
+    supplier = owner_with_supplier.company.suppliers.first()
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=20, storage=test_storage_owner)
+        for i in range(300)
+    ])
+    foreign_product = employee_with_product.company.storage.products.first()
+
+    url = reverse('supply-create')
+
+    def post(lines):
+        data = {
+            'supplier': supplier.id,
+            'delivery_date': '2026-03-01',
+            'products': [{'product': p.id, 'quantity': 1} for p in lines]
+                        + [{'product': foreign_product.id, 'quantity': 1}, {'product': 999999, 'quantity': 1}]
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(url, data, format='json')
+
+        return response, len(queries)
+
+    small, small_queries = post(products[:3])
+    large, large_queries = post(products)
+
+    assert large.status_code == 400
+    assert str(foreign_product.id) in large.data['products']['product'][0]
+    assert '999999' in large.data['products']['product'][0]
+    assert large_queries == small_queries
+    assert not Supply.objects.exists()
+
+
 #View list of supplies GET
 @pytest.mark.django_db
 def test_list_supplies_owner_success(api_client, owner_with_supply):
@@ -170,6 +211,49 @@ def test_list_supplies_unauthorized_error(api_client, owner_with_supply):
 
     assert response.status_code == 401
 
+@pytest.mark.django_db
+def test_supply_views_queries_independent_of_size(api_client, owner_with_supplier, test_storage_owner):
+    """Supplies list and detail cost the same number of queries for any number of lines"""
+
+    api_client.force_authenticate(user=owner_with_supplier)
+    supplier = owner_with_supplier.company.suppliers.first()
+
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=15, storage=test_storage_owner)
+        for i in range(10)
+    ])
+    supplies = Supply.objects.bulk_create([
+        Supply(supplier=supplier, delivery_date='2026-03-01')
+        for _ in range(10)
+    ])
+
+    def add_lines(delivered):
+        SupplyProduct.objects.bulk_create([
+            SupplyProduct(supply=supply, product=p, quantity=1)
+            for supply in supplies
+            for p in delivered
+        ])
+
+    def count_queries(url, lines):
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+        assert response.status_code == 200
+        info = response.data['results'][0] if 'results' in response.data else response.data
+        assert len(info['products_info']) == lines
+        return len(queries)
+
+    list_url = reverse('supply-list')
+    detail_url = reverse('supply-detail', args=[supplies[0].id])
+
+    add_lines(products[:1])
+    small_list = count_queries(list_url, 1)
+    small_detail = count_queries(detail_url, 1)
+
+    add_lines(products[1:])
+    assert count_queries(list_url, 10) == small_list
+    assert count_queries(detail_url, 10) == small_detail
+
+
 # View details GET
 
 @pytest.mark.django_db
@@ -195,6 +279,19 @@ def test_view_supply_owner_success(api_client, owner_with_supply, test_product_o
     test_product_owner.refresh_from_db()
     assert test_product_owner.quantity == 5
 
+@pytest.mark.django_db
+def test_view_supply_no_extra_queries(api_client, owner_with_supply, django_assert_num_queries):
+    """Permission checks compare ids, data versions, supply and its lines are the only queries"""
+
+    api_client.force_authenticate(user=owner_with_supply)
+    supply = Supply.objects.get()
+
+    with django_assert_num_queries(3):
+        response = api_client.get(reverse('supply-detail', args=[supply.id]))
+
+    assert response.status_code == 200
+
+
 @pytest.mark.django_db
 def test_view_supply_employee_success(api_client, employee_with_supply, test_product_employee):
     """Owner can view supply details for their company"""
@@ -494,3 +591,139 @@ def test_delete_supply_unauthorized_error(api_client, owner_with_supply):
 
 
 
+
+
+# Stock changes on edit
+
+@pytest.mark.django_db
+def test_edit_supply_changes_only_edited_products(api_client, owner_with_supplier, test_storage_owner):
+    """Editing one line of a supply changes only that product's stock"""
+
+    api_client.force_authenticate(user=owner_with_supplier)
+    supplier = owner_with_supplier.company.suppliers.first()
+
+    products = Product.objects.bulk_create([
+        Product(title=f'Product {i}', purchase_price=10, sale_price=15, quantity=0, storage=test_storage_owner)
+        for i in range(20)
+    ])
+    lines = [{'product': p.id, 'quantity': 5} for p in products]
+
+    response = api_client.post(reverse('supply-create'),
+                               {'supplier': supplier.id, 'delivery_date': '2026-03-01', 'products': lines},
+                               format='json')
+    assert response.status_code == 201
+    assert set(Product.objects.values_list('quantity', flat=True)) == {5}
+
+    supply = Supply.objects.get()
+    untouched_line_ids = set(
+        supply.supply_items.exclude(product=products[0]).values_list('id', flat=True)
+    )
+    updated_at = dict(Product.objects.values_list('id', 'updated_at'))
+
+    lines[0]['quantity'] = 8
+    response = api_client.put(reverse('supply-edit', args=[supply.id]),
+                              {'supplier': supplier.id, 'delivery_date': '2026-03-01', 'products': lines},
+                              format='json')
+    assert response.status_code == 200
+
+    assert Product.objects.get(id=products[0].id).quantity == 8
+    assert set(Product.objects.exclude(id=products[0].id).values_list('quantity', flat=True)) == {5}
+    for pk, value in Product.objects.exclude(id=products[0].id).values_list('id', 'updated_at'):
+        assert value == updated_at[pk]
+
+    assert untouched_line_ids <= set(supply.supply_items.values_list('id', flat=True))
+    assert supply.supply_items.count() == 20
+
+
+@pytest.mark.django_db
+def test_edit_supply_removed_product_rolled_back(api_client, owner_with_supply, test_product_owner):
+    """Product removed from a supply loses its delivered quantity"""
+
+    api_client.force_authenticate(user=owner_with_supply)
+    supply = Supply.objects.get()
+    supplier = supply.supplier
+    other_product = Product.objects.create(
+        title='Other Product',
+        purchase_price=10,
+        sale_price=15,
+        storage=test_product_owner.storage
+    )
+
+    url = reverse('supply-edit', args=[supply.id])
+    data = {'supplier': supplier.id,
+            'delivery_date': '2026-03-01',
+            'products': [
+                    {'product': other_product.id, 'quantity': 4}
+                ]
+            }
+    response = api_client.put(url, data, format='json')
+
+    assert response.status_code == 200
+
+    test_product_owner.refresh_from_db()
+    other_product.refresh_from_db()
+    assert test_product_owner.quantity == 0
+    assert other_product.quantity == 4
+    assert list(supply.supply_items.values_list('product_id', 'quantity')) == [(other_product.id, 4)]
+
+
+# Conditional GET
+
+@pytest.mark.django_db
+def test_supplies_etag_follows_supplier_delete(api_client, owner_with_supply, test_product_owner):
+    """Supplies cascade-deleted with their supplier change supplies and products ETags"""
+
+    api_client.force_authenticate(user=owner_with_supply)
+    supplies_url = reverse('supply-list')
+    products_url = reverse('products-list')
+
+    supplies_etag = api_client.get(supplies_url)['ETag']
+    products_etag = api_client.get(products_url)['ETag']
+    assert api_client.get(supplies_url, HTTP_IF_NONE_MATCH=supplies_etag).status_code == 304
+
+    supplier = owner_with_supply.company.suppliers.first()
+    response = api_client.delete(reverse('supplier-delete', args=[supplier.id]))
+    assert response.status_code == 204
+
+    response = api_client.get(supplies_url, HTTP_IF_NONE_MATCH=supplies_etag)
+    assert response.status_code == 200
+    assert response.data['results'] == []
+    assert api_client.get(products_url, HTTP_IF_NONE_MATCH=products_etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_supply_writes_bump_versions_last(api_client, owner_with_supply, test_product_owner):
+    """Supply create and edit move stock before data versions, locks are taken in one order"""
+
+    api_client.force_authenticate(user=owner_with_supply)
+    supplier = owner_with_supply.company.suppliers.first()
+    data = {'supplier': supplier.id, 'delivery_date': '2026-03-01',
+            'products': [{'product': test_product_owner.id, 'quantity': 5}]}
+
+    with CaptureQueriesContext(connection) as created:
+        response = api_client.post(reverse('supply-create'), data, format='json')
+    assert response.status_code == 201
+
+    data['products'][0]['quantity'] = 7
+
+    with CaptureQueriesContext(connection) as edited:
+        response = api_client.put(reverse('supply-edit', args=[response.data['id']]), data, format='json')
+    assert response.status_code == 200
+
+    for queries in (created, edited):
+        product_update = max(i for i, q in enumerate(queries) if q['sql'].startswith('UPDATE "products_product"'))
+        version_update = max(i for i, q in enumerate(queries) if q['sql'].startswith('UPDATE "core_dataversion"'))
+        assert product_update < version_update
+
+
+# Query plans
+
+@pytest.mark.django_db
+def test_supplies_list_query_uses_indexes(owner_with_supply, assert_no_full_scan):
+    """Supplies list query is an index search on suppliers and supplies"""
+
+    plan = assert_no_full_scan(
+        Supply.objects.filter(supplier__company=owner_with_supply.company).order_by('delivery_date'),
+        'suppliers_supplier', 'supplies_supply'
+    )
+    assert 'supply_supplier_date_idx' in plan
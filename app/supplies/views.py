@@ -1,9 +1,12 @@
 from django.shortcuts import render
-from .models import Supply
+from .models import Supply, SupplyProduct
 from .serializers import SupplySerializer
 from .permissions import SupplyPermissions
 from suppliers.models import Supplier
+from core.conditional import ConditionalGetMixin
+from core.tenant import get_tenant
 from rest_framework import generics, permissions
+from utils import products_info_prefetch
 
 class SupplyCreateView(generics.CreateAPIView):
     """Create new supply record"""
@@ -12,27 +15,32 @@ class SupplyCreateView(generics.CreateAPIView):
     serializer_class = SupplySerializer
     permission_classes = [permissions.IsAuthenticated, SupplyPermissions]
 
-class SupplyListView(generics.ListAPIView):
+class SupplyListView(ConditionalGetMixin, generics.ListAPIView):
     """Review list of supplies"""
 
     serializer_class = SupplySerializer
     permission_classes = [permissions.IsAuthenticated, SupplyPermissions]
+    version_models = ('supplies', 'products')
+    keyset_ordering = ('delivery_date', 'id')
 
     def get_queryset(self):
         return (Supply.objects
-        .filter(supplier__company=self.request.user.company)
-        .order_by('delivery_date'))
+        .filter(supplier__company_id=get_tenant(self.request).company_id)
+        .prefetch_related(products_info_prefetch('supply_items', SupplyProduct, 'supply_id', 'quantity'))
+        .order_by('delivery_date', 'id'))
 
-class SupplyDetailView(generics.RetrieveAPIView):
+class SupplyDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Review supply's detail"""
 
     serializer_class = SupplySerializer
     permission_classes = [permissions.IsAuthenticated, SupplyPermissions]
+    version_models = ('supplies', 'products')
 
     def get_queryset(self):
-        return Supply.objects.filter(
-            supplier__company=self.request.user.company
-        )
+        return (Supply.objects
+        .filter(supplier__company_id=get_tenant(self.request).company_id)
+        .select_related('supplier')
+        .prefetch_related(products_info_prefetch('supply_items', SupplyProduct, 'supply_id', 'quantity')))
 
 
 class SupplyEditView(generics.UpdateAPIView):
@@ -42,9 +50,10 @@ class SupplyEditView(generics.UpdateAPIView):
     permission_classes = [permissions.IsAuthenticated, SupplyPermissions]
 
     def get_queryset(self):
-        return Supply.objects.filter(
-            supplier__company=self.request.user.company
-        )
+        return (Supply.objects
+        .filter(supplier__company_id=get_tenant(self.request).company_id)
+        .select_related('supplier')
+        .prefetch_related(products_info_prefetch('supply_items', SupplyProduct, 'supply_id', 'quantity')))
 
 
 class SupplyDeleteView(generics.DestroyAPIView):
@@ -55,6 +64,6 @@ class SupplyDeleteView(generics.DestroyAPIView):
 
     def get_queryset(self):
         return Supply.objects.filter(
-            supplier__company=self.request.user.company
-        )
+            supplier__company_id=get_tenant(self.request).company_id
+        ).select_related('supplier')
 
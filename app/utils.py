@@ -1,6 +1,10 @@
 from rest_framework.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
 from datetime import datetime
 from decimal import Decimal
+import csv
+import json
 
 
 def create_owner(user_model, comp_model, username, email, company_title, inn):
@@ -34,6 +38,18 @@ def calculate_profit(purchase_price, price_at_sale, quantity) -> float:
     return (price_at_sale - purchase_price) * quantity
 
 
+def products_info_prefetch(lookup, line_model, *fields):
+    """Sale or supply lines with the given line fields and only the product columns used by products_info"""
+
+    return Prefetch(
+        lookup,
+        queryset=(line_model.objects
+                  .select_related('product')
+                  .only(*fields, 'product__id', 'product__title')
+                  .order_by('id'))
+    )
+
+
 def parse_date(date_str, date_name):
     """Function to validate and format dates"""
 
@@ -42,3 +58,62 @@ def parse_date(date_str, date_name):
 
     except ValueError:
         raise ValidationError(f'{date_name} should be in YYYY-MM-DD format')
+
+
+def parse_limit(limit_str, default=5, max_limit=100, limit_name='limit'):
+    """Function to validate number of requested rows"""
+
+    if limit_str is None:
+        return default
+
+    try:
+        limit = int(limit_str)
+    except ValueError:
+        raise ValidationError(f'{limit_name} should be a whole number')
+
+    if not 1 <= limit <= max_limit:
+        raise ValidationError(f'{limit_name} should be between 1 and {max_limit}')
+
+    return limit
+
+
+class _Echo:
+    """File-like object that returns written line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines, batch_size=1000):
+    """Join lines into larger chunks so streaming responses don't send one line per write"""
+
+    batch = []
+
+    for line in lines:
+        batch.append(line)
+
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_csv(header, rows):
+    """CSV chunks for StreamingHttpResponse, rows are consumed lazily"""
+
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    return _batched(lines())
+
+
+def stream_ndjson(objects):
+    """Newline-delimited JSON chunks for StreamingHttpResponse, objects are consumed lazily"""
+
+    return _batched(json.dumps(obj, cls=DjangoJSONEncoder) + '\n' for obj in objects)